@@ -0,0 +1,267 @@
+"""
+Suite de benchmarks de l'API, hors ligne et reproductible
+
+Peuple une base locale (SQLite temporaire, et PostgreSQL local s'il répond)
+avec une flotte et des missions de taille configurable, pilote la vraie
+application main:app en processus (httpx.ASGITransport) et mesure, par
+route : débit et latences p50/p95/p99.
+
+Chaque base est mesurée dans un sous-processus (database lit DATABASE_URL
+à l'import). Une base déjà peuplée est réutilisée telle quelle.
+
+Résultats en JSON (--output) ; --compare relit une référence et échoue
+(code 1) si une route régresse au-delà de --threshold.
+
+Usage :
+    pip install httpx
+    python -m benchmarks.bench_api --vehicules 100000 --missions 1000000 --output baseline.json
+    python -m benchmarks.bench_api --compare baseline.json --threshold 0.2
+    python -m benchmarks.bench_api --postgres postgresql://localhost/ipsco_bench --endpoints missions_list,missions_dashboard
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import (
+    use_local_database, seed_vehicules, seed_utilisateurs, seed_missions, summarize
+)
+
+# Nombre de demandeurs créés en plus des chauffeurs
+DEMANDEURS = 50
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base SQLite (temporaire par défaut)")
+    parser.add_argument(
+        "--postgres", default=os.getenv("BENCH_POSTGRES_URL"),
+        help="PostgreSQL local, ignoré s'il ne répond pas (BENCH_POSTGRES_URL)"
+    )
+    parser.add_argument("--vehicules", type=int, default=10000)
+    parser.add_argument("--missions", type=int, default=100000)
+    parser.add_argument("--chauffeurs", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes mesurées par route")
+    parser.add_argument("--warmup", type=int, default=20, help="Requêtes d'échauffement par route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", default=None, help="Routes à mesurer, séparées par des virgules")
+    parser.add_argument("--output", default=None, help="Écrire les résultats (JSON)")
+    parser.add_argument("--compare", default=None, help="Référence JSON à comparer")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--threshold", type=float, default=0.2, help="Régression tolérée (0.2 = +20 %%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Écart absolu ignoré (bruit)")
+    # Interne : mesure d'une base dans le sous-processus
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def endpoints(vehicules: int, missions: int, chauffeurs: int) -> dict:
+    """Routes mesurées : nom -> fabrique (rng) -> (chemin, paramètres)"""
+    debut = date.today() - timedelta(days=365)
+    jours = max(1, missions // max(1, min(chauffeurs, vehicules)))
+    termes = ["toyota", "AAB", "civic", "hilux", "nissan sentra", "000042"]
+
+    def semaine(rng):
+        jour = debut + timedelta(days=rng.randrange(jours))
+        return {"date_debut": jour.isoformat(), "date_fin": (jour + timedelta(days=7)).isoformat()}
+
+    return {
+        "vehicules_list": lambda rng: ("/api/vehicules/", {"skip": rng.randrange(max(1, vehicules - 20)), "limit": 20}),
+        "vehicules_keyset": lambda rng: ("/api/vehicules/", {"cursor": "", "limit": 50, "order_by": "immatriculation"}),
+        "vehicules_search": lambda rng: ("/api/vehicules/", {"search": rng.choice(termes), "limit": 10}),
+        "vehicule_detail": lambda rng: (f"/api/vehicules/{rng.randint(1, vehicules)}", {}),
+        "vehicule_stats": lambda rng: (f"/api/vehicules/{rng.randint(1, vehicules)}/stats", {}),
+        "vehicules_alerts": lambda rng: ("/api/vehicules/alerts", {}),
+        "stats": lambda rng: ("/stats", {}),
+        "missions_list": lambda rng: ("/api/missions/", {"skip": rng.randrange(1000), "limit": 20}),
+        "missions_statut": lambda rng: ("/api/missions/", {"statut": rng.choice(["en_attente", "planifiee", "en_cours"])}),
+        "missions_chauffeur": lambda rng: ("/api/missions/", {"chauffeur_id": rng.randint(1, chauffeurs), **semaine(rng)}),
+        "missions_vehicule": lambda rng: ("/api/missions/", {"vehicule_id": rng.randint(1, vehicules), **semaine(rng)}),
+        "missions_periode": lambda rng: ("/api/missions/", semaine(rng)),
+        "mission_detail": lambda rng: (f"/api/missions/{rng.randint(1, max(1, missions))}", {}),
+        "missions_dashboard": lambda rng: ("/api/missions/stats/dashboard", {}),
+    }
+
+def seed(args) -> dict:
+    """Peupler la base si elle est vide ; tailles effectives de la base"""
+    from sqlalchemy import func, inspect, select
+    from database import engine, create_indexes
+    from models.mission import Mission
+    from models.vehicule import Vehicule
+
+    debut = time.perf_counter()
+    vide = not inspect(engine).has_table(Vehicule.__tablename__)
+    if not vide:
+        with engine.connect() as connection:
+            vide = not connection.scalar(select(func.count(Vehicule.id)))
+    if vide:
+        seed_vehicules(engine, args.vehicules)
+        seed_utilisateurs(engine, args.chauffeurs, DEMANDEURS)
+        seed_missions(engine, args.missions, args.vehicules, args.chauffeurs, DEMANDEURS)
+    else:
+        print("Base déjà peuplée : réutilisée", file=sys.stderr)
+    create_indexes(engine)
+
+    with engine.connect() as connection:
+        tailles = {
+            "vehicules": connection.scalar(select(func.count(Vehicule.id))),
+            "missions": connection.scalar(select(func.count(Mission.id))),
+        }
+    return {**tailles, "chauffeurs": args.chauffeurs, "seed_s": round(time.perf_counter() - debut, 2)}
+
+async def measure(client, name: str, make_request, args) -> dict:
+    """`requests` appels répartis sur `concurrency` clients ; débit et percentiles"""
+    rng = random.Random(name)
+    for _ in range(args.warmup):
+        path, params = make_request(rng)
+        await client.get(path, params=params)
+
+    requetes = iter([make_request(rng) for _ in range(args.requests)])
+    samples = []
+
+    async def client_loop():
+        for path, params in requetes:
+            start = time.perf_counter()
+            response = await client.get(path, params=params)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400 and response.status_code != 404:
+                raise RuntimeError(f"{name} : {path} {params} -> {response.status_code} {response.text[:200]}")
+            samples.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    duree = time.perf_counter() - start
+    return {**summarize(samples), "rps": round(len(samples) / duree, 1)}
+
+async def run_worker(args) -> dict:
+    use_local_database(args.worker)
+    os.environ["MISSIONS_BACKEND"] = "sql"
+    base = seed(args)
+
+    import httpx
+    from database import async_engine
+    from main import app
+
+    routes = endpoints(base["vehicules"], base["missions"], args.chauffeurs)
+    if args.endpoints:
+        routes = {name: routes[name] for name in args.endpoints.split(",")}
+
+    resultats = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Agrégats du dashboard construits une fois, par la route de réparation
+        (await client.post("/api/missions/stats/dashboard/repair")).raise_for_status()
+        for name, make_request in routes.items():
+            resultats[name] = await measure(client, name, make_request, args)
+            print(f"  {name:<20} p50 {resultats[name]['p50_ms']:>8} ms  p95 {resultats[name]['p95_ms']:>8} ms  "
+                  f"{resultats[name]['rps']:>8} req/s", file=sys.stderr)
+
+    await async_engine.dispose()
+    return {"base": base, "endpoints": resultats}
+
+def postgres_available(url: str) -> bool:
+    """Le PostgreSQL local répond-il ?"""
+    from sqlalchemy import create_engine, text
+    try:
+        engine = create_engine(url)
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        engine.dispose()
+        return True
+    except Exception as e:
+        print(f"PostgreSQL ignoré ({url}) : {e.__class__.__name__}", file=sys.stderr)
+        return False
+
+def run_backend(backend: str, url: str, argv) -> dict:
+    """Mesurer une base dans un sous-processus"""
+    print(f"[{backend}] {url}", file=sys.stderr)
+    fd, result_file = tempfile.mkstemp(prefix="ipsco-bench-", suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_api", *argv, "--worker", url, "--result-file", result_file],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+def compare(current: dict, baseline: dict, metric: str, threshold: float, min_delta_ms: float) -> list:
+    """Routes dont `metric` dépasse la référence de plus de `threshold`"""
+    regressions = []
+    for backend, resultat in current["backends"].items():
+        reference = baseline.get("backends", {}).get(backend)
+        if reference is None:
+            print(f"[{backend}] absent de la référence", file=sys.stderr)
+            continue
+        for name, mesure in resultat["endpoints"].items():
+            avant = reference["endpoints"].get(name)
+            if avant is None:
+                continue
+            ecart = mesure[metric] - avant[metric]
+            ratio = mesure[metric] / avant[metric] if avant[metric] else float("inf")
+            regression = ratio > 1 + threshold and ecart >= min_delta_ms
+            print(f"[{backend}] {name:<20} {avant[metric]:>8} -> {mesure[metric]:>8} ms ({ratio - 1:+.0%})"
+                  f"{'  REGRESSION' if regression else ''}", file=sys.stderr)
+            if regression:
+                regressions.append(f"{backend}/{name}")
+    return regressions
+
+def main():
+    args = parse_args()
+
+    if args.worker:
+        resultat = asyncio.run(run_worker(args))
+        with open(args.result_file, "w") as f:
+            json.dump(resultat, f)
+        return
+
+    # Options transmises aux sous-processus (sans les bases ni la comparaison)
+    argv = [
+        "--vehicules", str(args.vehicules), "--missions", str(args.missions),
+        "--chauffeurs", str(args.chauffeurs), "--requests", str(args.requests),
+        "--warmup", str(args.warmup), "--concurrency", str(args.concurrency),
+    ]
+    if args.endpoints:
+        argv += ["--endpoints", args.endpoints]
+
+    bases = {"sqlite": args.database_url or use_local_database()}
+    if args.postgres and postgres_available(args.postgres):
+        bases["postgresql"] = args.postgres
+
+    current = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "backends": {backend: run_backend(backend, url, argv) for backend, url in bases.items()},
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.metric, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"Régressions ({args.metric} > +{args.threshold:.0%}) : {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+        print("Aucune régression", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark de concurrence : session synchrone vs session asyncio
+
+Compare la latence p99 de GET /api/vehicules sous 200 requêtes concurrentes :
+- "avant" : handler async def exécutant une Session SQLAlchemy synchrone
+  (ancienne implémentation, bloque la boucle d'événements)
+- "après" : routes/vehicules.py sur AsyncSession
+
+Sur SQLite, --latency-ms simule l'aller-retour réseau vers Supabase
+dans le thread qui exécute la requête SQL.
+
+Usage :
+    pip install httpx
+    python -m benchmarks.bench_concurrency --concurrency 200 --latency-ms 20
+    python -m benchmarks.bench_concurrency --database-url postgresql://localhost/ipsco_bench
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import use_local_database, seed_vehicules, summarize
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base locale (SQLite temporaire par défaut)")
+    parser.add_argument("--vehicules", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latence simulée par requête SQL (SQLite)")
+    return parser.parse_args()
+
+def install_latency(engine, async_engine, latency: float) -> None:
+    """Simuler la latence réseau dans le thread du driver SQLite"""
+    from sqlalchemy import event
+
+    def delay(_statement):
+        time.sleep(latency)
+
+    @event.listens_for(engine, "connect")
+    def on_sync_connect(dbapi_connection, _record):
+        dbapi_connection.set_trace_callback(delay)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_async_connect(dbapi_connection, _record):
+        # aiosqlite exécute sqlite3 dans son propre thread
+        connection = dbapi_connection._connection
+        dbapi_connection.await_(connection._execute(connection._conn.set_trace_callback, delay))
+
+def build_app():
+    """Application minimale : route historique + router asyncio"""
+    from fastapi import FastAPI, Depends
+    from sqlalchemy.orm import Session
+    from database import get_db
+    from models.vehicule import Vehicule
+    from routes import vehicules
+
+    app = FastAPI()
+    app.include_router(vehicules.router, prefix="/api/vehicules")
+
+    @app.get("/legacy/vehicules")
+    async def legacy_get_vehicules(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+        # Reproduction de l'ancien handler : I/O bloquante dans async def
+        rows = db.query(Vehicule).offset(skip).limit(limit).all()
+        return [{"id": v.id, "immatriculation": v.immatriculation} for v in rows]
+
+    return app
+
+async def run_burst(client, path: str, concurrency: int) -> list:
+    """Lancer `concurrency` requêtes simultanées et mesurer chacune"""
+    async def one(i):
+        start = time.perf_counter()
+        response = await client.get(path, params={"skip": i % 50, "limit": 10})
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(i) for i in range(concurrency)))
+
+async def main():
+    args = parse_args()
+    url = use_local_database(args.database_url)
+
+    import httpx
+    from database import engine, async_engine
+
+    seed_vehicules(engine, args.vehicules)
+    if url.startswith("sqlite") and args.latency_ms > 0:
+        install_latency(engine, async_engine, args.latency_ms / 1000)
+
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Échauffement des pools
+        await run_burst(client, "/legacy/vehicules", 5)
+        await run_burst(client, "/api/vehicules/", 5)
+
+        before = summarize(await run_burst(client, "/legacy/vehicules", args.concurrency))
+        after = summarize(await run_burst(client, "/api/vehicules/", args.concurrency))
+
+    await async_engine.dispose()
+    print(json.dumps({
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "avant_session_sync": before,
+        "apres_session_async": after,
+    }, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
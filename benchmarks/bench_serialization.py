@@ -0,0 +1,131 @@
+"""
+Benchmark de sérialisation des listes de véhicules
+
+Coût par ligne d'une page GET /api/vehicules :
+- "avant" : objets ORM complets validés un par un par pydantic
+  (response_model=List[VehiculeSummary]) puis json standard
+- "après" : colonnes de VehiculeSummary lues en tuples, encodées par orjson
+
+Deux mesures : sérialisation seule (mêmes lignes en mémoire) et requête
+complète à travers l'application ASGI.
+
+Usage :
+    pip install httpx
+    python -m benchmarks.bench_serialization --page-size 100 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import use_local_database, seed_vehicules, summarize
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base locale (SQLite temporaire par défaut)")
+    parser.add_argument("--vehicules", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=500, help="Répétitions de la mesure de sérialisation seule")
+    return parser.parse_args()
+
+def build_app():
+    """Application minimale : route historique (ORM + pydantic) + router actuel"""
+    from typing import List
+    from fastapi import FastAPI, Depends
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from database import get_async_db
+    from models.vehicule import Vehicule
+    from responses import DefaultResponse
+    from routes import vehicules
+    from schemas.vehicule import VehiculeSummary
+
+    app = FastAPI(default_response_class=DefaultResponse)
+    app.include_router(vehicules.router, prefix="/api/vehicules")
+
+    @app.get("/legacy/vehicules", response_model=List[VehiculeSummary], response_class=JSONResponse)
+    async def legacy_get_vehicules(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+        # Reproduction de l'ancien handler : objets ORM validés par response_model
+        # (même requête d'ETag que la route actuelle : seule la sérialisation diffère)
+        await vehicules._flotte_etag(db, skip, limit)
+        result = await db.execute(select(Vehicule).order_by(Vehicule.id).offset(skip).limit(limit))
+        return result.scalars().all()
+
+    return app
+
+async def measure_encoding(page_size: int, rounds: int) -> dict:
+    """Sérialisation seule d'une même page, en microsecondes par ligne"""
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import select
+    from database import AsyncSessionLocal
+    from models.vehicule import Vehicule
+    from responses import fast_json, rows_to_dicts
+    from routes.vehicules import SUMMARY_COLUMNS
+    from schemas.vehicule import VehiculeSummary
+
+    validate = getattr(VehiculeSummary, "model_validate", None) or VehiculeSummary.from_orm
+    async with AsyncSessionLocal() as db:
+        objets = (await db.execute(select(Vehicule).order_by(Vehicule.id).limit(page_size))).scalars().all()
+        lignes = (await db.execute(select(*SUMMARY_COLUMNS).order_by(Vehicule.id).limit(page_size))).all()
+
+    def avant():
+        return json.dumps(jsonable_encoder([validate(objet) for objet in objets])).encode()
+
+    def apres():
+        return fast_json(rows_to_dicts(lignes)).body
+
+    resultats = {}
+    for nom, fonction in (("avant_pydantic_json", avant), ("apres_tuples_orjson", apres)):
+        fonction()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fonction()
+        resultats[nom] = round((time.perf_counter() - start) / rounds / page_size * 1e6, 2)
+    return resultats
+
+async def run_sequential(client, path: str, page_size: int, count: int) -> list:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        response = await client.get(path, params={"skip": (i * page_size) % 1000, "limit": page_size})
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+async def main():
+    args = parse_args()
+    use_local_database(args.database_url)
+
+    import httpx
+    from database import engine, async_engine
+
+    seed_vehicules(engine, args.vehicules)
+
+    encodage = await measure_encoding(args.page_size, args.rounds)
+
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_sequential(client, "/legacy/vehicules", args.page_size, 5)
+        await run_sequential(client, "/api/vehicules/", args.page_size, 5)
+
+        before = await run_sequential(client, "/legacy/vehicules", args.page_size, args.requests)
+        after = await run_sequential(client, "/api/vehicules/", args.page_size, args.requests)
+
+    await async_engine.dispose()
+    print(json.dumps({
+        "page_size": args.page_size,
+        "serialisation_us_par_ligne": encodage,
+        "requete_complete": {
+            "avant_orm_pydantic": summarize(before),
+            "apres_tuples_orjson": summarize(after),
+            "us_par_ligne_avant": round(sum(before) / len(before) / args.page_size * 1e6, 2),
+            "us_par_ligne_apres": round(sum(after) / len(after) / args.page_size * 1e6, 2),
+        },
+    }, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
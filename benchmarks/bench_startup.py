@@ -0,0 +1,138 @@
+"""
+Benchmark du démarrage à froid (STARTUP_MODE eager / lazy)
+
+Chaque mesure lance un interpréteur neuf qui importe main, déroule le
+lifespan ASGI comme le ferait uvicorn, puis envoie aussitôt une requête API
+(retenue par la porte de readiness) en sondant /health/ready.
+
+Temps mesurés depuis le début du processus enfant :
+    import_s        import de main
+    port_s          fin du lifespan startup (uvicorn ouvre le port)
+    ready_s         première réponse 200 de /health/ready
+    first_success_s première réponse API réussie
+et process_s : durée totale du processus vue par le parent (interpréteur compris).
+
+Usage :
+    pip install httpx
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --modes lazy --database-url postgresql://localhost/ipsco_bench
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_local_database, seed_vehicules, seed_utilisateurs
+
+PHASES = ("import_s", "port_s", "ready_s", "first_success_s", "process_s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base à utiliser (SQLite temporaire par défaut)")
+    parser.add_argument("--modes", default="eager,lazy", help="Modes comparés, séparés par des virgules")
+    parser.add_argument("--runs", type=int, default=5, help="Démarrages mesurés par mode")
+    parser.add_argument("--path", default="/api/vehicules/?limit=1", help="Requête API attendue")
+    parser.add_argument("--output", default=None, help="Écrire les résultats (JSON)")
+    # Interne : un démarrage mesuré dans le processus enfant
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+async def cold_start(path: str, origin: float) -> dict:
+    """Importer main, dérouler le lifespan, attendre readiness et première réponse"""
+    import httpx
+    import main
+    mesures = {"import_s": time.perf_counter() - origin}
+
+    app = main.app
+    entree, sortie = asyncio.Queue(), asyncio.Queue()
+    await entree.put({"type": "lifespan.startup"})
+    lifespan = asyncio.create_task(
+        app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, entree.get, sortie.put)
+    )
+    message = await sortie.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"Lifespan : {message}")
+    mesures["port_s"] = time.perf_counter() - origin
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def premiere_requete():
+            while True:
+                response = await client.get(path)
+                if response.status_code < 400:
+                    mesures["first_success_s"] = time.perf_counter() - origin
+                    return
+                if response.status_code != 503:
+                    raise RuntimeError(f"{path} -> {response.status_code} {response.text[:200]}")
+                await asyncio.sleep(0.01)
+
+        async def readiness():
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+            mesures["ready_s"] = time.perf_counter() - origin
+
+        await asyncio.gather(premiere_requete(), readiness())
+
+    await entree.put({"type": "lifespan.shutdown"})
+    await sortie.get()
+    await lifespan
+    return {name: round(value, 4) for name, value in mesures.items()}
+
+def run_child(mode: str, path: str) -> dict:
+    """Un démarrage mesuré dans un interpréteur neuf"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--path", path],
+        env={**os.environ, "STARTUP_MODE": mode}, check=True, capture_output=True, text=True
+    )
+    mesures = json.loads(completed.stdout.strip().splitlines()[-1])
+    mesures["process_s"] = round(time.perf_counter() - start, 4)
+    return mesures
+
+def seed() -> None:
+    """Quelques véhicules et utilisateurs : la requête mesurée doit réussir"""
+    from sqlalchemy import inspect
+    from database import engine
+    from models.vehicule import Vehicule
+
+    if not inspect(engine).has_table(Vehicule.__tablename__):
+        seed_vehicules(engine, 100)
+        seed_utilisateurs(engine, 10, 5)
+    engine.dispose()
+
+def main():
+    args = parse_args()
+
+    if args.child:
+        import httpx  # noqa: F401 - client de mesure, importé avant l'origine
+        origin = time.perf_counter()
+        print(json.dumps(asyncio.run(cold_start(args.path, origin))))
+        return
+
+    use_local_database(args.database_url)
+    seed()
+
+    resultats = {}
+    for mode in args.modes.split(","):
+        run_child(mode, args.path)  # Cache disque et fichiers .pyc chauds
+        runs = [run_child(mode, args.path) for _ in range(args.runs)]
+        resultats[mode] = {
+            phase: round(statistics.median(run[phase] for run in runs), 4) for phase in PHASES
+        }
+        print(f"  {mode:<6} " + "  ".join(f"{phase} {resultats[mode][phase]:>7}" for phase in PHASES),
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": args.runs, "modes": resultats}, f, indent=2)
+    else:
+        print(json.dumps(resultats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Utilitaires partagés par les benchmarks
+Base SQLite locale, jeu de données et percentiles
+"""
+
+import os
+import random
+import tempfile
+from datetime import date, time, timedelta
+from typing import List
+
+def use_local_database(url: str = None) -> str:
+    """
+    Pointer DATABASE_URL vers une base locale
+    Doit être appelé AVANT d'importer database
+    """
+    if url is None:
+        fd, path = tempfile.mkstemp(prefix="ipsco-bench-", suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # Mesurer les routes, pas l'authentification
+    os.environ.setdefault("AUTH_DISABLED", "1")
+    return url
+
+def fake_vehicule(i: int, rng: random.Random) -> dict:
+    """Véhicule fictif déterministe"""
+    today = date.today()
+    marques = [("Toyota", "Corolla"), ("Honda", "Civic"), ("Nissan", "Sentra"), ("Toyota", "Hilux")]
+    marque, modele = marques[i % len(marques)]
+    return {
+        "immatriculation": f"{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{chr(65 + (i // 676) % 26)}-{i:06d}",
+        "marque": marque,
+        "modele": modele,
+        "couleur": rng.choice(["Blanc", "Bleu", "Rouge", "Noir"]),
+        "numero_chassis": f"CH{i:010d}",
+        "date_expiration_assurance": today + timedelta(days=rng.randint(-30, 365)),
+        "date_expiration_controle_technique": today + timedelta(days=rng.randint(-30, 365)),
+        "date_expiration_vignette": today + timedelta(days=rng.randint(-30, 365)),
+        "date_expiration_stationnement": today + timedelta(days=rng.randint(-30, 365)),
+        "kilometrage_dernier_entretien": 0,
+        "kilometrage_actuel": rng.randint(0, 200000),
+    }
+
+def seed_vehicules(engine, count: int, batch_size: int = 5000, seed: int = 42) -> None:
+    """Créer le schéma et insérer `count` véhicules par lots"""
+    from database import Base
+    from models.vehicule import Vehicule
+    import models.utilisateur  # noqa: F401 - table core_utilisateur
+    import models.mission  # noqa: F401 - table core_course
+
+    Base.metadata.create_all(engine)
+    rng = random.Random(seed)
+    with engine.begin() as connection:
+        for start in range(0, count, batch_size):
+            rows = [fake_vehicule(i, rng) for i in range(start, min(start + batch_size, count))]
+            connection.execute(Vehicule.__table__.insert(), rows)
+
+def seed_utilisateurs(engine, chauffeurs: int, demandeurs: int = 50) -> None:
+    """Chauffeurs actifs puis demandeurs (ids 1..chauffeurs = chauffeurs)"""
+    from models.utilisateur import Utilisateur
+
+    def utilisateur(username: str, role: str, **extra) -> dict:
+        return {"username": username, "password": "!", "role": role, "is_active": True,
+                "first_name": role.title(), "last_name": username, "email": "",
+                "telephone": None, "departement": None, **extra}
+
+    rows = [
+        utilisateur(f"chauffeur{i}", "chauffeur", telephone=f"+2439900{i:05d}") for i in range(chauffeurs)
+    ] + [
+        utilisateur(f"demandeur{i}", "demandeur", departement="Administration") for i in range(demandeurs)
+    ]
+    with engine.begin() as connection:
+        connection.execute(Utilisateur.__table__.insert(), rows)
+
+def fake_mission(i: int, rng: random.Random, vehicules: int, chauffeurs: int, demandeurs: int) -> dict:
+    """
+    Mission fictive déterministe, sans chevauchement : chaque jour compte au plus
+    un créneau 08:00-12:00 par chauffeur et par véhicule
+    """
+    jour, rang = divmod(i, min(chauffeurs, vehicules))
+    statut = rng.choices(
+        ["terminee", "annulee", "en_cours", "planifiee", "en_attente"], weights=[60, 10, 5, 15, 10]
+    )[0]
+    affectee = statut != "en_attente"
+    return {
+        "destination": f"Destination {i % 997}",
+        "lieu_depart": "Bureau IPSCO",
+        "date_souhaitee": date.today() - timedelta(days=365) + timedelta(days=jour),
+        "heure_depart": time(8, 0),
+        "heure_retour": time(12, 0),
+        "vehicule_id": (i % vehicules) + 1 if affectee else None,
+        "chauffeur_id": rang + 1 if affectee else None,
+        "demandeur_id": chauffeurs + (i % demandeurs) + 1,
+        "statut": statut,
+        "distance_parcourue": rng.randint(5, 120) if statut == "terminee" else 0,
+        "observations": "Urgent" if i % 50 == 0 else None,
+    }
+
+def seed_missions(
+    engine, count: int, vehicules: int, chauffeurs: int, demandeurs: int = 50,
+    batch_size: int = 10000, seed: int = 42
+) -> None:
+    """Insérer `count` missions par lots (après véhicules et utilisateurs)"""
+    from models.mission import Mission
+
+    rng = random.Random(seed)
+    with engine.begin() as connection:
+        for start in range(0, count, batch_size):
+            rows = [
+                fake_mission(i, rng, vehicules, chauffeurs, demandeurs)
+                for i in range(start, min(start + batch_size, count))
+            ]
+            connection.execute(Mission.__table__.insert(), rows)
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentile par rang le plus proche"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(samples: List[float]) -> dict:
+    """Résumé p50/p95/p99 en millisecondes"""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
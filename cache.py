@@ -0,0 +1,43 @@
+"""
+Cache mémoire à durée de vie (TTL)
+Propre à chaque worker : les écritures locales l'invalident explicitement
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Cache clé -> valeur expirant après `ttl` secondes"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(valeur, âge en secondes) ou None si absente / expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[0]
+        if age >= self.ttl:
+            return None
+        return entry[1], age
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Supprimer une entrée, ou tout le cache si key est None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+# Statistiques du tableau de bord (GET /stats)
+stats_cache = TTLCache(ttl=float(os.getenv("STATS_CACHE_TTL", "30")))
@@ -0,0 +1,42 @@
+"""
+Requêtes conditionnelles HTTP (ETag / If-None-Match)
+La version d'une ressource est sa date de modification : une réponse 304
+est décidée sans charger ni sérialiser la ressource
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Response, status
+
+# Revalidation systématique ; pas de cache partagé (réponses authentifiées)
+CACHE_CONTROL = "private, no-cache"
+
+def version(date_creation: Optional[datetime], date_modification: Optional[datetime]) -> Optional[str]:
+    """Version d'une ligne : dernière modification, sinon création"""
+    moment = date_modification or date_creation
+    return moment.isoformat() if moment else None
+
+def make_etag(*parts) -> str:
+    """ETag fort dérivé de la ressource, de sa version et de la représentation"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible (RFC 7232 §3.2) : W/"x" correspond à "x" """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers.update(etag_headers(etag))
+
+def not_modified(etag: str) -> Response:
+    """304 sans corps"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
@@ -4,28 +4,20 @@ IPSCO FastAPI - Version ultra-légère
 Migration complète de votre Django en FastAPI moderne
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from typing import List, Optional
 import os
 from datetime import datetime
 
-# Import conditionnel pour éviter les erreurs de connexion
-try:
-    from database import get_db, engine
-    from models import vehicule as vehicule_model
-    from schemas import vehicule as vehicule_schema
-    from routes import vehicules, missions, chauffeurs, auth
-    DB_AVAILABLE = True
-    print("✅ Base de données disponible")
-except Exception as e:
-    print(f"⚠️ Base de données non disponible: {e}")
-    DB_AVAILABLE = False
+from metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
+from replica import ReadYourWritesMiddleware
+from responses import DefaultResponse
+from sql_stats import SqlStatsMiddleware
+from startup import STARTUP_MODE, ReadinessGate, lifespan, state as startup_state
 
 # Application FastAPI
 app = FastAPI(
+    default_response_class=DefaultResponse,  # orjson si installé
     title="IPSCO API",
     description="Gestion de parc automobile - Version FastAPI ultra-légère",
     version="2.0.0",
@@ -48,19 +40,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inclure les routes si la base de données est disponible
-if DB_AVAILABLE:
-    try:
-        from routes import missions_complete
-        app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-        app.include_router(vehicules.router, prefix="/api/vehicules", tags=["Véhicules"])
-        app.include_router(missions.router, prefix="/api/missions", tags=["Missions Demo"])
-        app.include_router(missions_complete.router, prefix="/api/missions", tags=["Missions Complete"])
-        app.include_router(chauffeurs.router, prefix="/api/chauffeurs", tags=["Chauffeurs"])
-        print("✅ Routes API chargées (avec Missions complètes)")
-    except Exception as e:
-        print(f"⚠️ Erreur chargement routes: {e}")
-        DB_AVAILABLE = False
+# Requêtes SQL par requête HTTP (Server-Timing, N+1, budgets)
+app.add_middleware(SqlStatsMiddleware)
+
+# Lectures du client sur le primaire juste après ses écritures (réplique configurée)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Requêtes API retenues pendant le préchauffage ; première réponse réussie mesurée
+app.add_middleware(ReadinessGate)
+
+# Métriques par modèle de route (ajouté en dernier : enveloppe aussi CORS)
+app.add_middleware(MetricsMiddleware)
+
+def include_routers(app: FastAPI) -> None:
+    """
+    Importer et monter les routeurs API (base, modèles, services)
+    Mode eager : à l'import de main ; mode lazy : pendant le préchauffage
+    """
+    from routes import vehicules, missions, missions_complete, chauffeurs, auth, stats
+    from security import get_current_user, get_stream_user
+    # Jeton d'accès exigé sur les véhicules et les missions (en-tête Authorization)
+    protected = [Depends(get_current_user)]
+    app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+    app.include_router(vehicules.router, prefix="/api/vehicules", tags=["Véhicules"], dependencies=protected)
+    # Flux SSE : jeton aussi accepté en ?access_token= (EventSource)
+    app.include_router(missions_complete.stream_router, prefix="/api/missions", tags=["Missions Complete"], dependencies=[Depends(get_stream_user)])
+    # Missions complètes d'abord : même préfixe, leurs routes priment sur la démo
+    app.include_router(missions_complete.router, prefix="/api/missions", tags=["Missions Complete"], dependencies=protected)
+    app.include_router(missions.router, prefix="/api/missions", tags=["Missions Demo"], dependencies=protected)
+    app.include_router(chauffeurs.router, prefix="/api/chauffeurs", tags=["Chauffeurs"])
+    app.include_router(stats.router, tags=["Statistiques"])
+    # Schéma OpenAPI recalculé avec les routes montées
+    app.openapi_schema = None
+    print("✅ Routes API chargées (avec Missions complètes)")
+
+# Préchauffage (pool, mappers, routeurs en mode lazy) ; FastAPI 0.88 n'a pas de paramètre lifespan
+app.router.lifespan_context = lifespan(lambda: include_routers(app))
+
+if STARTUP_MODE != "lazy":
+    include_routers(app)
 
 @app.get("/")
 async def root():
@@ -83,56 +101,60 @@ async def root():
         "deployed_at": datetime.now().isoformat()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Métriques au format texte Prometheus
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+async def _database_health() -> dict:
+    if startup_state.warming:
+        return {"status": "starting"}
+    if startup_state.error is not None:
+        return {"status": "unavailable", "error": startup_state.error}
+    from database import check_database
+    return await check_database()
+
+@app.get("/health/live")
+async def liveness():
+    """
+    Liveness : le processus répond (aucun accès à la base)
+    """
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Readiness : 503 pendant le préchauffage et tant que la base ne répond pas au ping
+    """
+    database = await _database_health()
+    ready = startup_state.ready and database["status"] == "up"
+    return DefaultResponse(
+        {"status": "ready" if ready else "not_ready", "timestamp": datetime.now().isoformat(), "database": database},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
 @app.get("/health")
 async def health_check():
     """
     Vérification de santé de l'API
+    Toujours 200 ; état réel de la base (latence du ping, occupation du pool)
+    retard de la réplique, durées du démarrage (préchauffage, première requête réussie)
     """
+    database = await _database_health()
+    replica = {"status": "starting"}
+    if startup_state.ready:
+        from database import check_replica
+        replica = await check_replica()
     return {
-        "status": "healthy",
+        "status": "healthy" if database["status"] == "up" else "degraded",
         "timestamp": datetime.now().isoformat(),
-        "database": "connected"
+        "database": database,
+        "replica": replica,
+        "startup": startup_state.report()
     }
 
-@app.get("/stats")
-async def get_stats():
-    """
-    Statistiques générales du système
-    """
-    if DB_AVAILABLE:
-        try:
-            # Compte des véhicules (exemple)
-            from database import SessionLocal
-            db = SessionLocal()
-            total_vehicules = db.query(vehicule_model.Vehicule).count()
-            db.close()
-            
-            return {
-                "total_vehicules": total_vehicules,
-                "active_missions": 0,  # À implémenter
-                "total_chauffeurs": 0,  # À implémenter
-                "system_status": "operational",
-                "database_status": "connected"
-            }
-        except Exception as e:
-            return {
-                "total_vehicules": 0,
-                "active_missions": 0, 
-                "total_chauffeurs": 0,
-                "system_status": "database_connecting",
-                "database_status": "error",
-                "note": f"Erreur base de données: {str(e)}"
-            }
-    else:
-        return {
-            "total_vehicules": 0,
-            "active_missions": 0, 
-            "total_chauffeurs": 0,
-            "system_status": "demo_mode",
-            "database_status": "disconnected",
-            "note": "Mode démonstration - Base de données non connectée"
-        }
-
 # Routes de démonstration (sans base de données)
 @app.get("/demo/vehicules")
 async def demo_vehicules():
@@ -0,0 +1,182 @@
+"""
+Métriques Prometheus (format texte, sans dépendance)
+Requêtes HTTP par modèle de route, attente du pool de connexions et durée
+de vie des sessions ; exposées sur /metrics
+"""
+
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, List, Sequence, Tuple
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requêtes hors routes déclarées (404, fichiers statiques) : un seul libellé
+UNMATCHED = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self._samples())
+
+class Counter(_Metric):
+    """Compteur monotone par combinaison de libellés"""
+    type = "counter"
+
+    def inc(self, labels: Tuple = (), value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+class Gauge(_Metric):
+    """Valeur instantanée"""
+    type = "gauge"
+
+    def inc(self, labels: Tuple = (), value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def dec(self, labels: Tuple = (), value: float = 1) -> None:
+        self.inc(labels, -value)
+
+    def set(self, value: float, labels: Tuple = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    """Histogramme : compteurs par intervalle (cumulés à l'export), somme et total"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._values.get(labels)
+            if serie is None:
+                # [compteurs par intervalle..., +Inf, somme]
+                serie = self._values[labels] = [0] * (len(self.buckets) + 2)
+            serie[index] += 1
+            serie[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(serie)) for key, serie in self._values.items()]
+        lines = []
+        for key, serie in series:
+            cumul = 0
+            for borne, nombre in zip((*self.buckets, "+Inf"), serie[:-1]):
+                cumul += nombre
+                le = 'le="+Inf"' if borne == "+Inf" else f'le="{borne}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumul}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(serie[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumul}")
+        return lines
+
+REGISTRY: List[_Metric] = []
+
+def render() -> str:
+    """Toutes les métriques au format texte Prometheus"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# Requêtes HTTP
+http_requests = Counter(
+    "http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight", "Requêtes HTTP en cours"
+)
+http_duration = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route", "status")
+)
+
+# Base de données
+db_pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Attente d'une connexion du pool", ("engine",)
+)
+db_session_duration = Histogram(
+    "db_session_duration_seconds", "Durée de vie des sessions (get_db / get_async_db)", ("engine",)
+)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI pur (pas de BaseHTTPMiddleware) : quelques microsecondes
+    par requête. Libellé `route` = modèle déclaré (/api/vehicules/{vehicule_id}),
+    jamais le chemin brut.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        statut = 500
+        start = perf_counter()
+
+        async def send_status(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            duree = perf_counter() - start
+            http_in_flight.dec()
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else UNMATCHED, str(statut))
+            http_requests.inc(labels)
+            http_duration.observe(duree, labels)
+
+def instrument_pool(pool, engine: str) -> None:
+    """
+    Mesurer l'attente de checkout d'un pool SQLAlchemy
+    La classe du pool est remplacée par une sous-classe chronométrée :
+    elle survit à engine.dispose() (recreate() instancie self.__class__)
+    """
+    base = type(pool)
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return base._do_get(self)
+        finally:
+            db_pool_wait.observe(perf_counter() - start, (engine,))
+
+    pool.__class__ = type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
@@ -0,0 +1,89 @@
+"""
+Modèle Mission FastAPI
+Remplace le modèle Django Course (table core_course)
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Time, Text, ForeignKey, Index, insert, select
+from sqlalchemy.sql import func
+from database import Base
+from models import vehicule, utilisateur  # noqa: F401 - tables référencées
+
+class Mission(Base):
+    """
+    Modèle Mission - Version FastAPI
+    Compatible avec votre structure Django existante
+    """
+    __tablename__ = "core_course"  # Même nom que Django
+    __table_args__ = (
+        # Filtres de get_missions : égalité puis plage de dates, triés (date, id)
+        Index("ix_core_course_chauffeur_date", "chauffeur_id", "date_souhaitee", "id"),
+        Index("ix_core_course_vehicule_date", "vehicule_id", "date_souhaitee", "id"),
+        Index("ix_core_course_statut_date", "statut", "date_souhaitee", "id"),
+        Index("ix_core_course_date", "date_souhaitee", "id"),
+        {'extend_existing': True}  # Éviter le conflit de table
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    destination = Column(String(255), nullable=False)
+    lieu_depart = Column(String(255), nullable=True)
+    
+    # Planification
+    date_souhaitee = Column(Date, nullable=False)
+    heure_depart = Column(Time, nullable=True)
+    heure_retour = Column(Time, nullable=True)
+    
+    # Affectations (clés étrangères Django *_id)
+    vehicule_id = Column(Integer, ForeignKey("core_vehicule.id"), nullable=True)
+    chauffeur_id = Column(Integer, ForeignKey("core_utilisateur.id"), nullable=True)
+    demandeur_id = Column(Integer, ForeignKey("core_utilisateur.id"), nullable=True)
+    
+    statut = Column(String(20), nullable=False, default="en_attente")
+    distance_parcourue = Column(Integer, nullable=False, default=0)
+    observations = Column(Text, nullable=True)
+    
+    # Métadonnées
+    date_creation = Column(DateTime(timezone=True), server_default=func.now())
+    date_modification = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<Mission {self.id} - {self.destination} ({self.statut})>"
+
+class MissionStatsRollup(Base):
+    """
+    Agrégats des missions par (statut, date) pour le tableau de bord
+    Table propre à FastAPI, maintenue dans la transaction de chaque écriture
+    de l'API, créée et construite depuis core_course au démarrage
+    (database.ensure_owned_tables, appelé par le préchauffage).
+    Les écritures de l'application Django sur core_course ne la mettent pas
+    à jour : POST /api/missions/stats/dashboard/repair après un import ou
+    une saisie côté Django.
+    """
+    __tablename__ = "fastapi_mission_rollup"
+    __table_args__ = {'info': {'fastapi_owned': True}}
+
+    statut = Column(String(20), primary_key=True)
+    date_souhaitee = Column(Date, primary_key=True)
+    nombre = Column(Integer, nullable=False, default=0)
+    distance = Column(BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<MissionStatsRollup {self.statut} {self.date_souhaitee}: {self.nombre}>"
+
+def rollup_select():
+    """Agrégats recalculés depuis core_course (construction, vérification)"""
+    return select(
+        Mission.statut,
+        Mission.date_souhaitee,
+        func.count(Mission.id).label("nombre"),
+        func.coalesce(func.sum(Mission.distance_parcourue), 0).label("distance")
+    ).group_by(Mission.statut, Mission.date_souhaitee)
+
+def populate_rollup(connection) -> None:
+    """Construire les agrégats si la table est vide (création, ou create_all avant import)"""
+    table = MissionStatsRollup.__table__
+    if connection.execute(select(table.c.statut).limit(1)).first() is not None:
+        return
+    connection.execute(insert(table).from_select(["statut", "date_souhaitee", "nombre", "distance"], rollup_select()))
+
+# Appelé par ensure_owned_tables() après la création de la table
+MissionStatsRollup.__table__.info["populate"] = populate_rollup
@@ -0,0 +1,36 @@
+"""
+Modèle Utilisateur FastAPI
+Chauffeurs et demandeurs de missions (table Django core_utilisateur)
+"""
+
+from sqlalchemy import Column, Integer, String, Boolean
+from database import Base
+
+class Utilisateur(Base):
+    """
+    Modèle Utilisateur - Version FastAPI
+    Compatible avec votre structure Django existante (AbstractUser + rôle)
+    """
+    __tablename__ = "core_utilisateur"  # Même nom que Django
+    __table_args__ = {'extend_existing': True}  # Éviter le conflit de table
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(150), unique=True, nullable=False)
+    password = Column(String(128), nullable=False)
+    first_name = Column(String(150), nullable=False, default="")
+    last_name = Column(String(150), nullable=False, default="")
+    email = Column(String(254), nullable=False, default="")
+    is_active = Column(Boolean, nullable=False, default=True)
+    
+    # Rôle applicatif : admin, dispatch, chauffeur, demandeur...
+    role = Column(String(20), nullable=False, index=True)
+    telephone = Column(String(20), nullable=True)
+    departement = Column(String(100), nullable=True)
+    
+    def __repr__(self):
+        return f"<Utilisateur {self.username} ({self.role})>"
+    
+    @property
+    def nom_complet(self):
+        """Prénom et nom"""
+        return f"{self.first_name} {self.last_name}".strip() or self.username
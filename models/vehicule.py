@@ -3,7 +3,7 @@ Modèle Véhicule FastAPI
 Remplace le modèle Django par SQLAlchemy
 """
 
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -13,7 +13,11 @@ class Vehicule(Base):
     Compatible avec votre structure Django existante
     """
     __tablename__ = "core_vehicule"  # Même nom que Django
-    __table_args__ = {'extend_existing': True}  # Éviter le conflit de table
+    __table_args__ = (
+        # Pagination keyset ordonnée par (immatriculation, id)
+        Index("ix_core_vehicule_immatriculation_id", "immatriculation", "id"),
+        {'extend_existing': True}  # Éviter le conflit de table
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     immatriculation = Column(String(20), unique=True, index=True, nullable=False)
@@ -24,10 +28,10 @@ class Vehicule(Base):
     
     # Dates importantes
     date_immatriculation = Column(Date, nullable=True)
-    date_expiration_assurance = Column(Date, nullable=False)
-    date_expiration_controle_technique = Column(Date, nullable=False)
-    date_expiration_vignette = Column(Date, nullable=False)
-    date_expiration_stationnement = Column(Date, nullable=False)
+    date_expiration_assurance = Column(Date, nullable=False, index=True)
+    date_expiration_controle_technique = Column(Date, nullable=False, index=True)
+    date_expiration_vignette = Column(Date, nullable=False, index=True)
+    date_expiration_stationnement = Column(Date, nullable=False, index=True)
     
     # Métadonnées
     date_creation = Column(DateTime(timezone=True), server_default=func.now())
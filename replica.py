@@ -0,0 +1,65 @@
+"""
+Lectures sur réplique (optionnelle) : réglages et adhérence au primaire
+DATABASE_REPLICA_URL définie : les routes de lecture (database.get_read_db)
+passent par la réplique, les écritures restent sur le primaire (get_async_db).
+
+Retour au primaire :
+- pendant DB_READ_YOUR_WRITES secondes après une écriture du client
+  (cookie posé par ReadYourWritesMiddleware) : il relit ce qu'il vient d'écrire ;
+- tant que le retard mesuré de la réplique dépasse DB_REPLICA_MAX_LAG
+  (sonde rafraîchie toutes les DB_REPLICA_LAG_INTERVAL secondes) ou qu'elle
+  ne répond pas.
+"""
+
+import os
+import time
+from typing import Mapping
+
+# Moteur créé par database.py ; ce module reste léger (middleware chargé avec main)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Retard toléré (secondes) au-delà duquel les lectures repassent sur le primaire
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+
+# Fréquence de la sonde de retard (secondes)
+REPLICA_LAG_INTERVAL = float(os.getenv("DB_REPLICA_LAG_INTERVAL", "2"))
+
+# Fenêtre de lecture sur le primaire après une écriture (secondes)
+READ_YOUR_WRITES = float(os.getenv("DB_READ_YOUR_WRITES", "10"))
+
+STICKY_COOKIE = "ipsco_primary"
+
+READ_METHODS = ("GET", "HEAD")
+
+def sticky(cookies: Mapping[str, str]) -> bool:
+    """Le client a écrit il y a moins de READ_YOUR_WRITES secondes"""
+    try:
+        return float(cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    """
+    Middleware ASGI : après une écriture réussie, cookie renvoyant les
+    lectures de ce client sur le primaire pendant READ_YOUR_WRITES secondes
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DATABASE_REPLICA_URL or scope["method"] in READ_METHODS + ("OPTIONS",):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # SameSite=None : renvoyé aussi par les frontends d'un autre site (CORS avec credentials)
+                cookie = (
+                    f"{STICKY_COOKIE}={time.time() + READ_YOUR_WRITES:.0f}; "
+                    f"Max-Age={READ_YOUR_WRITES:.0f}; Path=/; HttpOnly; SameSite=None; Secure"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_cookie)
@@ -0,0 +1,36 @@
+"""
+Réponses JSON rapides
+orjson comme encodeur par défaut (repli sur json si absent) et listes
+construites directement depuis les lignes SQL : le response_model des
+routes reste la référence du schéma OpenAPI, sans validation par objet
+"""
+
+from typing import List, Optional, Sequence
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:  # Repli sur l'encodeur standard
+    orjson = None
+
+# Classe de réponse par défaut de l'application
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+def rows_to_dicts(rows: Sequence) -> List[dict]:
+    """Lignes SQL (select de colonnes) -> dicts, sans objets ORM ni pydantic"""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+def fast_json(content, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    Réponse prête à l'envoi : FastAPI ne repasse ni par response_model ni par
+    jsonable_encoder. Le contenu doit déjà respecter le schéma déclaré.
+    """
+    if orjson is None:
+        content = jsonable_encoder(content)
+    return DefaultResponse(content, status_code=status_code, headers=headers)
@@ -4,65 +4,110 @@ Remplace Django Auth par JWT moderne
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+import os
+from database import get_async_db
+from models.utilisateur import Utilisateur
+from security import (
+    ACCESS_TOKEN_MINUTES,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_current_user,
+    user_from_claims,
+    verify_password,
+)
 
 router = APIRouter()
-security = HTTPBearer()
+
+# Compte de démonstration (admin / admin123), uniquement en développement
+DEMO_ADMIN_HASH = "$2b$12$t3LLDp150iL85PVNQquAxuMFYfcm87cSysF/FBQiO6rQDFgXkQ9d."
+DEMO_ENABLED = os.getenv("ENVIRONMENT", "production") == "development"
+
+# Permissions par rôle applicatif
+PERMISSIONS = {
+    "admin": ["read", "write", "delete"],
+    "dispatch": ["read", "write"],
+}
 
 class LoginRequest(BaseModel):
     username: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class LoginResponse(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
+    expires_in: int = ACCESS_TOKEN_MINUTES * 60
     user_id: int
     username: str
 
+def _tokens(user: dict) -> LoginResponse:
+    return LoginResponse(
+        access_token=create_access_token(user),
+        refresh_token=create_refresh_token(user),
+        user_id=user["user_id"],
+        username=user["username"]
+    )
+
 @router.post("/login", response_model=LoginResponse)
-async def login(credentials: LoginRequest):
+async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Connexion utilisateur
     Remplace Django login
     """
-    # Pour le moment, authentification simple
-    # À remplacer par votre logique d'auth
-    if credentials.username == "admin" and credentials.password == "admin123":
-        return LoginResponse(
-            access_token="fake-jwt-token-for-testing",
-            user_id=1,
-            username=credentials.username
-        )
-    
+    utilisateur = await db.scalar(
+        select(Utilisateur).where(Utilisateur.username == credentials.username)
+    )
+
+    if utilisateur is not None:
+        valide = await verify_password(credentials.password, utilisateur.password)
+        if valide and utilisateur.is_active:
+            return _tokens({
+                "user_id": utilisateur.id,
+                "username": utilisateur.username,
+                "role": utilisateur.role
+            })
+    elif DEMO_ENABLED and credentials.username == "admin":
+        if await verify_password(credentials.password, DEMO_ADMIN_HASH):
+            return _tokens({"user_id": 1, "username": "admin", "role": "admin"})
+    else:
+        # Coût constant : un nom inconnu répond aussi lentement qu'un mauvais mot de passe
+        await verify_password(credentials.password, None)
+
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Nom d'utilisateur ou mot de passe incorrect"
     )
 
+@router.post("/refresh", response_model=LoginResponse)
+async def refresh(request: RefreshRequest):
+    """
+    Nouveaux jetons à partir d'un refresh token valide
+    """
+    claims = decode_token(request.refresh_token, "refresh")
+    return _tokens(user_from_claims(claims))
+
 @router.post("/logout")
 async def logout():
     """
     Déconnexion utilisateur
+    Jetons sans état : le client les supprime, ils expirent d'eux-mêmes
     """
     return {"message": "Déconnexion réussie"}
 
 @router.get("/me")
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def read_current_user(user: dict = Depends(get_current_user)):
     """
     Informations utilisateur connecté
     """
-    # Vérification simple du token
-    if credentials.credentials == "fake-jwt-token-for-testing":
-        return {
-            "user_id": 1,
-            "username": "admin",
-            "role": "admin",
-            "permissions": ["read", "write", "delete"]
-        }
-    
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Token invalide"
-    )
+    return {
+        **user,
+        "permissions": PERMISSIONS.get(user["role"], ["read"])
+    }
@@ -2,14 +2,46 @@
 Module Missions complet avec CRUD
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from pydantic import BaseModel
-from datetime import date, datetime
-from database import get_db
+from pydantic import BaseModel, validator
+from datetime import date, datetime, timedelta
+import asyncio
+import json
+import os
+from cache import stats_cache
+from database import get_async_db, get_read_db
+from http_cache import etag_matches, make_etag, not_modified, set_etag
+from responses import fast_json
+from schemas.fields import fields_query
+from services.mission_store import MissionStore, MissionConflict
+from services.mission_repository import MISSION_FIELDS, SqlMissionRepository, MemoryMissionRepository
+from services.dispatch import MAX_JOURS, plan_dispatch
+from services.events import mission_events
 
 router = APIRouter()
+# Flux SSE : monté à part, avec une authentification qui accepte ?access_token=
+stream_router = APIRouter()
+
+# Stockage des missions : "sql" (table core_course) ou "memory" (démonstration)
+MISSIONS_BACKEND = os.getenv("MISSIONS_BACKEND", "sql")
+
+# Flux SSE : commentaire de maintien de connexion (proxies) et délai de reconnexion
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+SSE_RETRY_MS = 5000
+
+STATUTS_VALIDES = ("en_attente", "planifiee", "en_cours", "terminee", "annulee")
+
+def _valider_heure(v):
+    """Heure au format HH:MM"""
+    if v is None:
+        return v
+    try:
+        return datetime.strptime(v.strip(), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError("Heure attendue au format HH:MM")
 
 # Modèles Pydantic
 class MissionBase(BaseModel):
@@ -23,6 +55,8 @@ class MissionBase(BaseModel):
     demandeur_id: Optional[int] = None
     observations: Optional[str] = None
 
+    _heures = validator('heure_depart', 'heure_retour', allow_reuse=True)(_valider_heure)
+
 class MissionCreate(MissionBase):
     pass
 
@@ -35,6 +69,37 @@ class MissionUpdate(BaseModel):
     heure_retour: Optional[str] = None
     distance_parcourue: Optional[int] = None
 
+    _heures = validator('heure_depart', 'heure_retour', allow_reuse=True)(_valider_heure)
+
+    @validator('destination', 'statut', 'distance_parcourue', pre=True)
+    def non_null(cls, v):
+        """Facultatifs, mais colonnes NOT NULL : null explicite refusé (422)"""
+        if v is None:
+            raise ValueError("Valeur null non autorisée pour ce champ")
+        return v
+
+    @validator('statut')
+    def valider_statut(cls, v):
+        if v not in STATUTS_VALIDES:
+            raise ValueError(f"Statut invalide. Statuts valides: {list(STATUTS_VALIDES)}")
+        return v
+
+class DispatchRequest(BaseModel):
+    date_debut: date
+    date_fin: Optional[date] = None  # Par défaut : date_debut
+    simulation: bool = False  # Calculer sans écrire
+
+    @validator('date_fin', always=True)
+    def valider_fenetre(cls, v, values):
+        debut = values.get('date_debut')
+        if v is None or debut is None:
+            return v or debut
+        if v < debut:
+            raise ValueError("date_fin doit suivre date_debut")
+        if v - debut > timedelta(days=MAX_JOURS):
+            raise ValueError(f"Fenêtre limitée à {MAX_JOURS} jours")
+        return v
+
 class MissionResponse(MissionBase):
     id: int
     statut: str
@@ -45,6 +110,10 @@ class MissionResponse(MissionBase):
     class Config:
         from_attributes = True
 
+# ?fields= : champs de la représentation JSON (schéma MissionResponse + relations)
+list_fields = fields_query(MISSION_FIELDS, MISSION_FIELDS)
+detail_fields = fields_query((*MISSION_FIELDS, "timeline"), (*MISSION_FIELDS, "timeline"))
+
 # Données de démonstration enrichies
 MISSIONS_DEMO = [
     {
@@ -109,7 +178,39 @@ MISSIONS_DEMO = [
     }
 ]
 
-@router.get("/", response_model=List[dict])
+# Stockage indexé, initialisé avec les données de démonstration
+mission_store = MissionStore(MISSIONS_DEMO)
+
+async def get_mission_repository(db: AsyncSession = Depends(get_async_db)):
+    """Dependency : accès aux missions selon MISSIONS_BACKEND"""
+    if MISSIONS_BACKEND == "memory":
+        return MemoryMissionRepository(mission_store)
+    return SqlMissionRepository(db)
+
+async def get_read_mission_repository(db: AsyncSession = Depends(get_read_db)):
+    """Dependency : lectures seules, servies par la réplique si elle est configurée"""
+    if MISSIONS_BACKEND == "memory":
+        return MemoryMissionRepository(mission_store)
+    return SqlMissionRepository(db)
+
+async def _mission_conflict(repository, conflit: MissionConflict) -> HTTPException:
+    """409 avec la liste des missions qui occupent déjà la ressource (relations résolues)"""
+    await repository.resolve_relations(conflit.conflits)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "Véhicule ou chauffeur déjà engagé sur cette période",
+            "conflits": conflit.conflits
+        }
+    )
+
+def _mission_not_found(mission_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Mission {mission_id} non trouvée"
+    )
+
+@router.get("/", response_model=dict)
 async def get_missions(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
@@ -117,34 +218,29 @@ async def get_missions(
     date_debut: Optional[date] = Query(None),
     date_fin: Optional[date] = Query(None),
     chauffeur_id: Optional[int] = Query(None),
-    vehicule_id: Optional[int] = Query(None)
+    vehicule_id: Optional[int] = Query(None),
+    fields: tuple = Depends(list_fields),
+    repository = Depends(get_read_mission_repository)
 ):
     """
     Récupérer toutes les missions avec filtres avancés
+    `fields` restreint les colonnes lues et les champs renvoyés
     """
-    missions = MISSIONS_DEMO.copy()
-    
-    # Filtres
-    if statut:
-        missions = [m for m in missions if m["statut"].lower() == statut.lower()]
-    
-    if date_debut:
-        missions = [m for m in missions if m["date_souhaitee"] >= str(date_debut)]
-    
-    if date_fin:
-        missions = [m for m in missions if m["date_souhaitee"] <= str(date_fin)]
+    missions, total = await repository.list(
+        skip=skip,
+        limit=limit,
+        fields=fields,
+        statut=statut,
+        date_debut=date_debut,
+        date_fin=date_fin,
+        chauffeur_id=chauffeur_id,
+        vehicule_id=vehicule_id
+    )
+    # Relations imbriquées : une requête par table, pas une par mission
+    missions = await repository.resolve_relations(missions)
     
-    if chauffeur_id:
-        missions = [m for m in missions if m["chauffeur"] and m["chauffeur"]["id"] == chauffeur_id]
-    
-    if vehicule_id:
-        missions = [m for m in missions if m["vehicule"] and m["vehicule"]["id"] == vehicule_id]
-    
-    # Pagination
-    total = len(missions)
-    missions = missions[skip:skip + limit]
-    
-    return {
+    # Dicts déjà au format JSON : encodage direct, sans jsonable_encoder
+    return fast_json({
         "missions": missions,
         "total": total,
         "page": skip // limit + 1,
@@ -156,54 +252,117 @@ async def get_missions(
             "chauffeur_id": chauffeur_id,
             "vehicule_id": vehicule_id
         }
-    }
+    })
+
+@stream_router.get("/stream")
+async def stream_missions(
+    chauffeur_id: Optional[int] = Query(None),
+    vehicule_id: Optional[int] = Query(None),
+    statut: Optional[str] = Query(None),
+    last_event_id: Optional[int] = Header(None, description="Reprise après reconnexion (EventSource)")
+):
+    """
+    Flux Server-Sent Events des changements de missions (remplace le polling)
+    Création, modification, statut, affectation et suppression, filtrés par
+    chauffeur, véhicule ou statut. Un événement "resync" signale qu'il faut
+    recharger la liste (client trop lent ou reprise impossible).
+    """
+    async def generate():
+        subscription = mission_events.subscribe(
+            chauffeur_id=chauffeur_id, vehicule_id=vehicule_id, statut=statut
+        )
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if last_event_id is not None:
+                manques = mission_events.replay(subscription, last_event_id)
+                if manques is None:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    for event in manques:
+                        yield event.trame
+            perdus = 0
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if subscription.perdus != perdus:
+                    yield f"event: resync\ndata: {json.dumps({'perdus': subscription.perdus - perdus})}\n\n"
+                    perdus = subscription.perdus
+                yield event.trame
+        finally:
+            mission_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{mission_id}")
-async def get_mission(mission_id: int):
+async def get_mission(
+    mission_id: int,
+    response: Response,
+    fields: tuple = Depends(detail_fields),
+    if_none_match: Optional[str] = Header(None),
+    repository = Depends(get_read_mission_repository)
+):
     """
     Détail complet d'une mission
+    ETag sur la date de modification et les relations imbriquées (véhicule, chauffeur,
+    demandeur) : 304 sans charger la mission
+    `fields` restreint les colonnes lues et les champs renvoyés
     """
-    mission = next((m for m in MISSIONS_DEMO if m["id"] == mission_id), None)
+    if if_none_match:
+        version = await repository.version(mission_id, fields)
+        if version is not None:
+            etag = make_etag("mission", mission_id, version, *fields)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
     
-    if not mission:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mission {mission_id} non trouvée"
-        )
+    # Dates pour l'ETag et statut pour la timeline, retirés s'ils n'ont pas été demandés
+    lus = [name for name in fields if name != "timeline"] + ["date_creation", "date_modification"]
+    if "timeline" in fields:
+        lus.append("statut")
+    mission = await repository.get(mission_id, fields=tuple(dict.fromkeys(lus)))
+    
+    if mission is None:
+        raise _mission_not_found(mission_id)
+    
+    await repository.resolve_relations([mission])
+    set_etag(response, make_etag("mission", mission_id, repository.loaded_version(mission, fields), *fields))
     
     # Ajouter des détails supplémentaires
-    mission_detail = mission.copy()
-    mission_detail["timeline"] = [
-        {"time": "08:00", "event": "Mission créée", "status": "completed"},
-        {"time": "08:30", "event": "Départ confirmé", "status": "completed" if mission["statut"] != "planifiee" else "pending"},
-        {"time": "12:00", "event": "Arrivée destination", "status": "completed" if mission["statut"] == "terminee" else "pending"},
-        {"time": "17:00", "event": "Retour bureau", "status": "completed" if mission["statut"] == "terminee" else "pending"}
-    ]
+    if "timeline" in fields:
+        mission["timeline"] = [
+            {"time": "08:00", "event": "Mission créée", "status": "completed"},
+            {"time": "08:30", "event": "Départ confirmé", "status": "completed" if mission["statut"] != "planifiee" else "pending"},
+            {"time": "12:00", "event": "Arrivée destination", "status": "completed" if mission["statut"] == "terminee" else "pending"},
+            {"time": "17:00", "event": "Retour bureau", "status": "completed" if mission["statut"] == "terminee" else "pending"}
+        ]
     
-    return mission_detail
+    return {name: mission[name] for name in fields if name in mission}
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def create_mission(mission_data: MissionCreate):
+async def create_mission(mission_data: MissionCreate, repository = Depends(get_mission_repository)):
     """
     Créer une nouvelle mission
     """
-    new_id = max([m["id"] for m in MISSIONS_DEMO]) + 1
-    
-    new_mission = {
-        "id": new_id,
-        **mission_data.dict(),
-        "statut": "en_attente",
-        "distance_parcourue": 0,
-        "date_creation": datetime.now().isoformat(),
-        "vehicule": None,
-        "chauffeur": None,
-        "demandeur": {"id": 1, "nom": "Utilisateur", "departement": "Général"}
-    }
-    
-    MISSIONS_DEMO.append(new_mission)
+    try:
+        mission = await repository.create({
+            **mission_data.dict(),
+            "statut": "en_attente",
+            "distance_parcourue": 0
+        })
+    except MissionConflict as conflit:
+        raise await _mission_conflict(repository, conflit)
+    stats_cache.invalidate()
+    await repository.resolve_relations([mission])
+    mission_events.publish("mission.creee", mission)
     
     return {
-        "mission": new_mission,
+        "mission": mission,
         "message": "Mission créée avec succès",
         "next_steps": [
             "Attribution d'un véhicule",
@@ -212,57 +371,91 @@ async def create_mission(mission_data: MissionCreate):
         ]
     }
 
-@router.put("/{mission_id}")
-async def update_mission(mission_id: int, mission_data: MissionUpdate):
+@router.post("/dispatch")
+async def dispatch_missions(
+    demande: DispatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    repository = Depends(get_mission_repository)
+):
     """
-    Modifier une mission
+    Affecter automatiquement véhicules et chauffeurs aux missions en attente
+    Véhicules aux documents valides et hors entretien, missions urgentes d'abord ;
+    les affectations sont écrites en une transaction (statut "planifiee")
     """
-    mission_index = next((i for i, m in enumerate(MISSIONS_DEMO) if m["id"] == mission_id), None)
+    plan = await plan_dispatch(db, repository, demande.date_debut, demande.date_fin)
     
-    if mission_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mission {mission_id} non trouvée"
-        )
+    if not demande.simulation and plan["affectations"]:
+        try:
+            missions = await repository.assign(plan["affectations"])
+        except MissionConflict as conflit:
+            raise await _mission_conflict(repository, conflit)
+        stats_cache.invalidate()
+        await repository.resolve_relations(missions)
+        for mission in missions:
+            mission_events.publish("mission.affectee", mission, {"statut": "en_attente"})
+        ecrites = {mission["id"] for mission in missions}
+        plan["affectations"] = [a for a in plan["affectations"] if a["mission_id"] in ecrites]
     
+    return {
+        **plan,
+        "simulation": demande.simulation,
+        "message": f"{len(plan['affectations'])} mission(s) affectée(s) sur {plan['missions_analysees']}"
+    }
+
+@router.put("/{mission_id}")
+async def update_mission(
+    mission_id: int,
+    mission_data: MissionUpdate,
+    repository = Depends(get_mission_repository)
+):
+    """
+    Modifier une mission
+    """
     # Mettre à jour les champs modifiés
-    update_data = mission_data.dict(exclude_unset=True)
+    try:
+        resultat = await repository.update(mission_id, mission_data.dict(exclude_unset=True))
+    except MissionConflict as conflit:
+        raise await _mission_conflict(repository, conflit)
     
-    for field, value in update_data.items():
-        if field in MISSIONS_DEMO[mission_index]:
-            MISSIONS_DEMO[mission_index][field] = value
+    if resultat is None:
+        raise _mission_not_found(mission_id)
     
-    MISSIONS_DEMO[mission_index]["date_modification"] = datetime.now().isoformat()
+    stats_cache.invalidate()
+    await repository.resolve_relations([resultat[1]])
+    mission_events.publish("mission.modifiee", resultat[1], resultat[0])
     
     return {
-        "mission": MISSIONS_DEMO[mission_index],
+        "mission": resultat[1],
         "message": "Mission mise à jour avec succès"
     }
 
 @router.put("/{mission_id}/statut")
-async def update_mission_statut(mission_id: int, nouveau_statut: str):
+async def update_mission_statut(
+    mission_id: int,
+    nouveau_statut: str,
+    repository = Depends(get_mission_repository)
+):
     """
     Changer le statut d'une mission
     """
-    statuts_valides = ["en_attente", "planifiee", "en_cours", "terminee", "annulee"]
-    
-    if nouveau_statut not in statuts_valides:
+    if nouveau_statut not in STATUTS_VALIDES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Statut invalide. Statuts valides: {statuts_valides}"
+            detail=f"Statut invalide. Statuts valides: {list(STATUTS_VALIDES)}"
         )
     
-    mission_index = next((i for i, m in enumerate(MISSIONS_DEMO) if m["id"] == mission_id), None)
+    try:
+        resultat = await repository.update(mission_id, {"statut": nouveau_statut})
+    except MissionConflict as conflit:
+        raise await _mission_conflict(repository, conflit)
     
-    if mission_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mission {mission_id} non trouvée"
-        )
+    if resultat is None:
+        raise _mission_not_found(mission_id)
     
-    ancien_statut = MISSIONS_DEMO[mission_index]["statut"]
-    MISSIONS_DEMO[mission_index]["statut"] = nouveau_statut
-    MISSIONS_DEMO[mission_index]["date_modification"] = datetime.now().isoformat()
+    stats_cache.invalidate()
+    await repository.resolve_relations([resultat[1]])
+    mission_events.publish("mission.statut", resultat[1], resultat[0])
+    ancien_statut = resultat[0]["statut"]
     
     return {
         "mission_id": mission_id,
@@ -273,48 +466,66 @@ async def update_mission_statut(mission_id: int, nouveau_statut: str):
     }
 
 @router.get("/stats/dashboard")
-async def get_missions_stats():
+async def get_missions_stats(repository = Depends(get_read_mission_repository)):
     """
     Statistiques des missions pour le dashboard
     """
-    total = len(MISSIONS_DEMO)
-    
-    stats_by_status = {}
-    for mission in MISSIONS_DEMO:
-        statut = mission["statut"]
-        stats_by_status[statut] = stats_by_status.get(statut, 0) + 1
-    
-    # Missions d'aujourd'hui
-    today = date.today().isoformat()
-    missions_today = [m for m in MISSIONS_DEMO if m["date_souhaitee"] == today]
-    
-    # Distance totale
-    distance_totale = sum([m["distance_parcourue"] for m in MISSIONS_DEMO])
+    stats = await repository.dashboard(date.today())
+    stats_by_status = stats["stats_by_status"]
+    total = sum(stats_by_status.values())
     
     return {
         "total_missions": total,
-        "missions_aujourd_hui": len(missions_today),
+        "missions_aujourd_hui": stats["missions_aujourd_hui"],
         "stats_by_status": stats_by_status,
-        "distance_totale_km": distance_totale,
+        "distance_totale_km": stats["distance_totale"],
         "missions_actives": stats_by_status.get("en_cours", 0),
         "missions_en_attente": stats_by_status.get("en_attente", 0),
         "taux_completion": round((stats_by_status.get("terminee", 0) / total * 100), 1) if total > 0 else 0
     }
 
+@router.get("/stats/dashboard/verify")
+async def verify_missions_stats(repository = Depends(get_mission_repository)):
+    """
+    Contrôle de cohérence : recalcul complet des agrégats du dashboard (lecture seule)
+    """
+    ecarts = await repository.verify()
+    
+    return {
+        "coherent": not ecarts,
+        "ecarts": ecarts,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.post("/stats/dashboard/repair")
+async def repair_missions_stats(repository = Depends(get_mission_repository)):
+    """
+    Reconstruire les agrégats du dashboard depuis les missions en cas d'écart
+    (écritures Django sur core_course, par exemple)
+    """
+    ecarts = await repository.verify(repair=True)
+    if ecarts:
+        stats_cache.invalidate()
+    
+    return {
+        "ecarts": ecarts,
+        "repare": bool(ecarts),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.delete("/{mission_id}")
-async def delete_mission(mission_id: int):
+async def delete_mission(mission_id: int, repository = Depends(get_mission_repository)):
     """
     Supprimer une mission
     """
-    mission_index = next((i for i, m in enumerate(MISSIONS_DEMO) if m["id"] == mission_id), None)
+    deleted_mission = await repository.delete(mission_id)
     
-    if mission_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mission {mission_id} non trouvée"
-        )
+    if deleted_mission is None:
+        raise _mission_not_found(mission_id)
     
-    deleted_mission = MISSIONS_DEMO.pop(mission_index)
+    stats_cache.invalidate()
+    await repository.resolve_relations([deleted_mission])
+    mission_events.publish("mission.supprimee", deleted_mission)
     
     return {
         "message": f"Mission {mission_id} supprimée avec succès",
@@ -0,0 +1,85 @@
+"""
+Statistiques générales du système
+Une seule requête agrégée, mise en cache (TTL) et invalidée par les écritures
+"""
+
+from datetime import date
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, func, case, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import stats_cache
+from database import get_read_db
+from models.vehicule import Vehicule
+from models.utilisateur import Utilisateur
+from models.mission import Mission
+from routes.missions_complete import mission_store, MISSIONS_BACKEND
+
+router = APIRouter()
+
+def _stats_query(today: date, with_missions: bool):
+    """Tous les compteurs en un aller-retour (sous-requêtes scalaires)"""
+    documents_expires = or_(
+        Vehicule.date_expiration_assurance < today,
+        Vehicule.date_expiration_controle_technique < today,
+        Vehicule.date_expiration_vignette < today,
+        Vehicule.date_expiration_stationnement < today
+    )
+    vehicules = select(
+        func.count().label("total"),
+        func.coalesce(func.sum(case((documents_expires, 1), else_=0)), 0).label("expires")
+    ).select_from(Vehicule).subquery()
+    chauffeurs = (
+        select(func.count())
+        .select_from(Utilisateur)
+        .where(Utilisateur.role == "chauffeur", Utilisateur.is_active.is_(True))
+        .scalar_subquery()
+    )
+    columns = [
+        vehicules.c.total.label("total_vehicules"),
+        vehicules.c.expires.label("vehicules_documents_expires"),
+        chauffeurs.label("total_chauffeurs")
+    ]
+    if with_missions:
+        columns.append(
+            select(func.count(Mission.id))
+            .where(Mission.statut == "en_cours")
+            .scalar_subquery()
+            .label("active_missions")
+        )
+    return select(*columns)
+
+@router.get("/stats")
+async def get_stats(db: AsyncSession = Depends(get_read_db)):
+    """
+    Statistiques générales du système
+    """
+    cached = stats_cache.get("stats")
+    if cached is not None:
+        stats, age = cached
+        return {**stats, "cached": True, "cache_age_seconds": round(age, 1)}
+    
+    try:
+        with_missions = MISSIONS_BACKEND == "sql"
+        row = (await db.execute(_stats_query(date.today(), with_missions))).one()
+    except SQLAlchemyError as e:
+        return {
+            "total_vehicules": 0,
+            "active_missions": 0,
+            "total_chauffeurs": 0,
+            "system_status": "database_connecting",
+            "database_status": "error",
+            "note": f"Erreur base de données: {str(e)}"
+        }
+    
+    stats = {
+        "total_vehicules": row.total_vehicules,
+        "vehicules_documents_expires": row.vehicules_documents_expires,
+        "active_missions": row.active_missions if with_missions else mission_store.count("en_cours"),
+        "total_chauffeurs": row.total_chauffeurs,
+        "system_status": "operational",
+        "database_status": "connected"
+    }
+    stats_cache.set("stats", stats)
+    
+    return {**stats, "cached": False, "cache_age_seconds": 0.0}
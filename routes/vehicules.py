@@ -3,76 +3,404 @@ Routes API pour les véhicules
 Remplace les vues Django
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, UploadFile, File, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, or_, tuple_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from datetime import date, timedelta
+import base64
+import csv
+import io
+import json
+from cache import stats_cache
+from database import get_async_db, get_read_db, read_sessionmaker
+from http_cache import etag_headers, etag_matches, make_etag, not_modified, version
+from responses import fast_json
 from models.vehicule import Vehicule
+from services.search import search_vehicules, search_condition, vehicule_index
+from services.vehicule_import import import_vehicules as run_import
+from schemas.fields import fields_query
 from schemas.vehicule import (
     VehiculeCreate, 
     VehiculeUpdate, 
     VehiculeResponse, 
     VehiculeSummary,
-    VehiculeList
+    VehiculeList,
+    VehiculePage,
+    VehiculeBatch
 )
 
 router = APIRouter()
 
-@router.get("/", response_model=List[VehiculeSummary])
+async def _get_vehicule_or_404(db: AsyncSession, vehicule_id: int) -> Vehicule:
+    """Charger un véhicule par sa clé primaire ou lever une 404"""
+    vehicule = await db.get(Vehicule, vehicule_id)
+    
+    if not vehicule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Véhicule avec l'ID {vehicule_id} non trouvé"
+        )
+    
+    return vehicule
+
+# Documents administratifs suivis et leur date d'expiration
+DOCUMENTS = {
+    "assurance": Vehicule.date_expiration_assurance,
+    "controle_technique": Vehicule.date_expiration_controle_technique,
+    "vignette": Vehicule.date_expiration_vignette,
+    "stationnement": Vehicule.date_expiration_stationnement,
+}
+
+# Seuil d'alerte par défaut (jours avant expiration)
+ALERT_DAYS = 30
+
+def _alerte_document(doc: str, jours: int, within_days: int = ALERT_DAYS) -> Optional[str]:
+    """Message d'alerte pour un document, ou None s'il n'expire pas bientôt"""
+    if jours < 0:
+        return f"{doc.title()} EXPIRÉ depuis {abs(jours)} jours"
+    if jours <= within_days:
+        return f"{doc.title()} expire dans {jours} jours"
+    return None
+
+# Champs exposables (schéma VehiculeResponse + nom_complet) -> colonne SQL
+VEHICULE_COLUMNS = {
+    **{name: getattr(Vehicule, name) for name in VehiculeResponse.__fields__},
+    "nom_complet": (Vehicule.immatriculation + " - " + Vehicule.marque + " " + Vehicule.modele).label("nom_complet"),
+}
+
+# Colonnes de VehiculeSummary ; nom_complet calculé par la base
+SUMMARY_COLUMNS = tuple(VEHICULE_COLUMNS[name] for name in VehiculeSummary.__fields__)
+
+# ?fields= : liste en VehiculeSummary, détail en VehiculeResponse par défaut
+list_fields = fields_query(VEHICULE_COLUMNS, VehiculeSummary.__fields__)
+detail_fields = fields_query(VEHICULE_COLUMNS, VehiculeResponse.__fields__)
+
+# Colonnes de tri autorisées pour la pagination keyset
+ORDER_KEYS = {
+    "id": (Vehicule.id,),
+    "immatriculation": (Vehicule.immatriculation, Vehicule.id),
+}
+
+def _encode_cursor(order_by: str, vehicule) -> str:
+    """Curseur opaque : clé de tri du dernier élément de la page"""
+    values = [getattr(vehicule, column.key) for column in ORDER_KEYS[order_by]]
+    raw = json.dumps([order_by, *values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, order_by: str) -> list:
+    """Décoder un curseur et vérifier qu'il correspond au tri demandé"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order, *values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        order, values = None, []
+    
+    columns = ORDER_KEYS[order_by]
+    if order != order_by or len(values) != len(columns) or not all(
+        isinstance(value, column.type.python_type) for value, column in zip(values, columns)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur invalide pour ce tri"
+        )
+    
+    return values
+
+# Version d'une ligne de la page (id, dernière modification) : lue seule pour décider d'un 304
+PAGE_VERSION = (
+    Vehicule.id.label("_etag_id"),
+    func.coalesce(Vehicule.date_modification, Vehicule.date_creation).label("_etag_version"),
+)
+
+def _page_etag(rows, *params) -> str:
+    """ETag de liste : ids et versions des lignes de la page, plus les paramètres de la requête"""
+    return make_etag("vehicules", [(row._etag_id, str(row._etag_version)) for row in rows], *params)
+
+@router.get("/", response_model=Union[List[VehiculeSummary], VehiculePage])
 async def get_vehicules(
     skip: int = Query(0, ge=0, description="Nombre d'éléments à ignorer"),
     limit: int = Query(10, ge=1, le=100, description="Nombre d'éléments à retourner"),
-    search: Optional[str] = Query(None, description="Recherche par immatriculation ou marque"),
-    db: Session = Depends(get_db)
+    search: Optional[str] = Query(None, description="Recherche floue par immatriculation, marque ou modèle"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Pagination par curseur : vide pour la première page, puis next_cursor"
+    ),
+    order_by: str = Query("id", regex="^(id|immatriculation)$", description="Tri : id ou immatriculation"),
+    fields: tuple = Depends(list_fields),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Récupérer la liste des véhicules
     Remplace la vue Django ListView
+    
+    Sans `cursor` : pagination skip/limit (liste simple, compatibilité).
+    Avec `cursor` : pagination keyset, coût constant quelle que soit la page.
+    ETag sur les versions des lignes de la page : avec If-None-Match, seuls
+    id et date de modification de la page sont lus avant de répondre 304.
+    Réponse construite depuis les colonnes de VehiculeSummary (pas d'objets ORM).
+    `fields` restreint le SELECT et la réponse (ex. fields=id,immatriculation).
+    """
+    order_columns = ORDER_KEYS[order_by]
+    params = (skip, limit, search, cursor, order_by, fields)
+    values = _decode_cursor(cursor, order_by) if cursor else None
+    
+    async def lire(columns) -> list:
+        """Lignes de la page demandée (mêmes prédicats et fenêtre), limitées à `columns`"""
+        # Recherche floue indexée, classée par pertinence en mode skip/limit
+        if search and cursor is None:
+            return await search_vehicules(db, search, skip, limit, columns=columns)
+        query = select(*columns).order_by(*order_columns)
+        if cursor is None:
+            return (await db.execute(query.offset(skip).limit(limit))).all()
+        # Keyset : WHERE (clé) > (clé du dernier élément), servi par l'index
+        if values is not None:
+            query = query.where(tuple_(*order_columns) > tuple_(*values))
+        if search:
+            query = query.where(await search_condition(db, search, order_by, values, limit + 1))
+        return (await db.execute(query.limit(limit + 1))).all()
+    
+    if if_none_match:
+        etag = _page_etag(await lire(PAGE_VERSION), *params)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
+    # Version lue avec la page (ETag) ; clés de tri non demandées lues pour le curseur
+    cles = [column for column in order_columns if column.key not in fields] if cursor is not None else []
+    rows = await lire([*(VEHICULE_COLUMNS[name] for name in fields), *cles, *PAGE_VERSION])
+    headers = etag_headers(_page_etag(rows, *params))
+    
+    if cursor is None:
+        return fast_json([{name: row._mapping[name] for name in fields} for row in rows], headers=headers)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(order_by, rows[-1])
+    
+    return fast_json(
+        {
+            "vehicules": [{name: row._mapping[name] for name in fields} for row in rows],
+            "next_cursor": next_cursor,
+            "order_by": order_by
+        },
+        headers=headers
+    )
+
+@router.get("/alerts")
+async def get_vehicules_alerts(
+    request: Request,
+    within_days: int = Query(ALERT_DAYS, ge=0, le=365, description="Horizon d'alerte en jours"),
+    document: Optional[str] = Query(
+        None,
+        regex="^(assurance|controle_technique|vignette|stationnement)$",
+        description="Limiter à un type de document"
+    )
+):
+    """
+    Documents expirés ou expirant bientôt, pour toute la flotte
+    Une seule requête indexée, réponse JSON diffusée en flux
+    """
+    today = date.today()
+    limite = today + timedelta(days=within_days)
+    documents = {document: DOCUMENTS[document]} if document else DOCUMENTS
+    
+    # Chaque comparaison est servie par l'index de sa colonne (BitmapOr sur PostgreSQL)
+    query = (
+        select(Vehicule.id, Vehicule.immatriculation, Vehicule.marque, Vehicule.modele, *documents.values())
+        .where(or_(*(column <= limite for column in documents.values())))
+        .order_by(Vehicule.id)
+    )
+    
+    session_factory = await read_sessionmaker(request)
+    
+    async def generate():
+        yield json.dumps({"date_reference": today.isoformat(), "within_days": within_days})[:-1]
+        yield ', "vehicules": ['
+        total = 0
+        async with session_factory() as db:
+            result = await db.stream(query.execution_options(yield_per=500))
+            async for row in result:
+                alertes = []
+                for doc, date_expiration in zip(documents, row[4:]):
+                    jours = (date_expiration - today).days
+                    message = _alerte_document(doc, jours, within_days)
+                    if message:
+                        alertes.append({
+                            "document": doc,
+                            "date_expiration": date_expiration.isoformat(),
+                            "jours_restants": jours,
+                            "expire": jours < 0,
+                            "message": message
+                        })
+                item = {
+                    "vehicule_id": row.id,
+                    "immatriculation": row.immatriculation,
+                    "nom_complet": f"{row.immatriculation} - {row.marque} {row.modele}",
+                    "alertes": alertes
+                }
+                yield ("," if total else "") + json.dumps(item, ensure_ascii=False)
+                total += 1
+        yield f'], "total": {total}}}'
+    
+    return StreamingResponse(generate(), media_type="application/json")
+
+# Taille des lots lus via le curseur serveur lors de l'export
+EXPORT_CHUNK_SIZE = 1000
+
+def _export_value(value):
+    """Dates en ISO 8601, le reste tel quel"""
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+@router.get("/export")
+async def export_vehicules(
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson)$", description="csv ou ndjson")
+):
+    """
+    Export complet de la flotte pour la BI
+    Curseur côté serveur (yield_per) et sérialisation incrémentale :
+    la mémoire reste bornée quelle que soit la taille de la flotte
     """
-    query = db.query(Vehicule)
+    columns = list(Vehicule.__table__.columns)
+    names = [column.key for column in columns]
+    query = select(*columns).order_by(Vehicule.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    
+    session_factory = await read_sessionmaker(request)
     
-    # Recherche
-    if search:
-        query = query.filter(
-            (Vehicule.immatriculation.ilike(f"%{search}%")) |
-            (Vehicule.marque.ilike(f"%{search}%")) |
-            (Vehicule.modele.ilike(f"%{search}%"))
+    async def generate():
+        if format == "csv":
+            yield ",".join(names) + "\r\n"
+        async with session_factory() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+                buffer = io.StringIO()
+                if format == "csv":
+                    writer = csv.writer(buffer)
+                    writer.writerows([_export_value(value) for value in row] for row in rows)
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(
+                            {name: _export_value(value) for name, value in zip(names, row)},
+                            ensure_ascii=False
+                        ))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="vehicules.{format}"'}
+    )
+
+# Clés acceptées par une lecture groupée
+BATCH_MAX = 100
+
+def _batch_keys(raw: str) -> list:
+    """'3, 1,3' -> ['3', '1'] : ordre conservé, doublons retirés"""
+    return list(dict.fromkeys(key.strip() for key in raw.split(",") if key.strip()))
+
+# Avant /{vehicule_id} : "batch" n'est pas un identifiant
+@router.get("/batch", response_model=VehiculeBatch)
+async def get_vehicules_batch(
+    ids: Optional[str] = Query(None, description=f"Identifiants séparés par des virgules ({BATCH_MAX} max)"),
+    immatriculations: Optional[str] = Query(
+        None, description=f"Immatriculations séparées par des virgules ({BATCH_MAX} max)"
+    ),
+    fields: tuple = Depends(list_fields),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Plusieurs véhicules en un appel (véhicules référencés par une liste de missions)
+    Un seul SELECT ... IN ; réponse dans l'ordre demandé, clés introuvables dans `missing`
+    """
+    if (ids is None) == (immatriculations is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indiquer ids ou immatriculations"
         )
     
-    vehicules = query.offset(skip).limit(limit).all()
+    if ids is not None:
+        column = Vehicule.id
+        try:
+            keys = list(dict.fromkeys(int(key) for key in _batch_keys(ids)))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ids : entiers séparés par des virgules"
+            )
+    else:
+        column = Vehicule.immatriculation
+        keys = _batch_keys(immatriculations)
     
-    # Ajouter nom_complet pour chaque véhicule
-    for vehicule in vehicules:
-        vehicule.nom_complet = vehicule.nom_complet
+    if not keys or len(keys) > BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Entre 1 et {BATCH_MAX} véhicules par requête"
+        )
     
-    return vehicules
+    result = await db.execute(
+        select(*(VEHICULE_COLUMNS[name] for name in fields), column.label("_cle")).where(column.in_(keys))
+    )
+    trouves = {ligne._cle: {name: ligne._mapping[name] for name in fields} for ligne in result}
+    
+    return fast_json({
+        "vehicules": [trouves[key] for key in keys if key in trouves],
+        "missing": [key for key in keys if key not in trouves]
+    })
+
+def _vehicule_etag(vehicule_id: int, date_creation, date_modification, fields=()) -> str:
+    return make_etag("vehicule", vehicule_id, version(date_creation, date_modification), *fields)
 
 @router.get("/{vehicule_id}", response_model=VehiculeResponse)
-async def get_vehicule(vehicule_id: int, db: Session = Depends(get_db)):
+async def get_vehicule(
+    vehicule_id: int,
+    fields: tuple = Depends(detail_fields),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
     Récupérer un véhicule par ID
     Remplace la vue Django DetailView
+    
+    Avec If-None-Match : seules les dates sont lues pour décider d'un 304.
+    Seules les colonnes de `fields` sont lues (toutes par défaut).
     """
-    vehicule = db.query(Vehicule).filter(Vehicule.id == vehicule_id).first()
+    dates = (Vehicule.date_creation.label("_date_creation"), Vehicule.date_modification.label("_date_modification"))
     
-    if not vehicule:
+    if if_none_match:
+        ligne = (await db.execute(select(*dates).where(Vehicule.id == vehicule_id))).first()
+        if ligne is not None:
+            etag = _vehicule_etag(vehicule_id, *ligne, fields)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+    
+    ligne = (await db.execute(
+        select(*(VEHICULE_COLUMNS[name] for name in fields), *dates).where(Vehicule.id == vehicule_id)
+    )).first()
+    
+    if ligne is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Véhicule avec l'ID {vehicule_id} non trouvé"
         )
     
-    return vehicule
+    etag = _vehicule_etag(vehicule_id, ligne._date_creation, ligne._date_modification, fields)
+    return fast_json({name: ligne._mapping[name] for name in fields}, headers=etag_headers(etag))
 
 @router.post("/", response_model=VehiculeResponse, status_code=status.HTTP_201_CREATED)
-async def create_vehicule(vehicule_data: VehiculeCreate, db: Session = Depends(get_db)):
+async def create_vehicule(vehicule_data: VehiculeCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Créer un nouveau véhicule
     Remplace la vue Django CreateView
     """
     # Vérifier l'unicité de l'immatriculation
-    existing = db.query(Vehicule).filter(
-        Vehicule.immatriculation == vehicule_data.immatriculation
-    ).first()
+    existing = (await db.execute(
+        select(Vehicule.id).where(Vehicule.immatriculation == vehicule_data.immatriculation)
+    )).first()
     
     if existing:
         raise HTTPException(
@@ -81,9 +409,9 @@ async def create_vehicule(vehicule_data: VehiculeCreate, db: Session = Depends(g
         )
     
     # Vérifier l'unicité du châssis
-    existing_chassis = db.query(Vehicule).filter(
-        Vehicule.numero_chassis == vehicule_data.numero_chassis
-    ).first()
+    existing_chassis = (await db.execute(
+        select(Vehicule.id).where(Vehicule.numero_chassis == vehicule_data.numero_chassis)
+    )).first()
     
     if existing_chassis:
         raise HTTPException(
@@ -94,28 +422,44 @@ async def create_vehicule(vehicule_data: VehiculeCreate, db: Session = Depends(g
     # Créer le véhicule
     vehicule = Vehicule(**vehicule_data.dict())
     db.add(vehicule)
-    db.commit()
-    db.refresh(vehicule)
+    await db.commit()
+    await db.refresh(vehicule)
+    vehicule_index.upsert(vehicule)
+    stats_cache.invalidate()
     
     return vehicule
 
+@router.post("/import")
+async def import_vehicules(
+    fichier: UploadFile = File(..., description="Fichier CSV (en-têtes = champs VehiculeCreate) ou NDJSON"),
+    format: Optional[str] = Query(None, regex="^(csv|ndjson)$", description="Déduit de l'extension si absent"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import massif de véhicules
+    Validation ligne par ligne, unicité vérifiée par lots, écriture par lots
+    """
+    fmt = format or ("ndjson" if (fichier.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    
+    rapport = await run_import(db, fichier.file, fmt)
+    
+    if rapport["importes"]:
+        vehicule_index.invalidate()
+        stats_cache.invalidate()
+    
+    return rapport
+
 @router.put("/{vehicule_id}", response_model=VehiculeResponse)
 async def update_vehicule(
     vehicule_id: int, 
     vehicule_data: VehiculeUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Modifier un véhicule
     Remplace la vue Django UpdateView
     """
-    vehicule = db.query(Vehicule).filter(Vehicule.id == vehicule_id).first()
-    
-    if not vehicule:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Véhicule avec l'ID {vehicule_id} non trouvé"
-        )
+    vehicule = await _get_vehicule_or_404(db, vehicule_id)
     
     # Mettre à jour les champs modifiés
     update_data = vehicule_data.dict(exclude_unset=True)
@@ -123,46 +467,37 @@ async def update_vehicule(
     for field, value in update_data.items():
         setattr(vehicule, field, value)
     
-    db.commit()
-    db.refresh(vehicule)
+    await db.commit()
+    await db.refresh(vehicule)
+    vehicule_index.upsert(vehicule)
+    stats_cache.invalidate()
     
     return vehicule
 
 @router.delete("/{vehicule_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_vehicule(vehicule_id: int, db: Session = Depends(get_db)):
+async def delete_vehicule(vehicule_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Supprimer un véhicule
     Remplace la vue Django DeleteView
     """
-    vehicule = db.query(Vehicule).filter(Vehicule.id == vehicule_id).first()
+    vehicule = await _get_vehicule_or_404(db, vehicule_id)
     
-    if not vehicule:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Véhicule avec l'ID {vehicule_id} non trouvé"
-        )
-    
-    db.delete(vehicule)
-    db.commit()
+    await db.delete(vehicule)
+    await db.commit()
+    vehicule_index.remove(vehicule_id)
+    stats_cache.invalidate()
     
     return None
 
 @router.get("/{vehicule_id}/stats")
-async def get_vehicule_stats(vehicule_id: int, db: Session = Depends(get_db)):
+async def get_vehicule_stats(vehicule_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Statistiques d'un véhicule
     Nouvelle fonctionnalité FastAPI
     """
-    vehicule = db.query(Vehicule).filter(Vehicule.id == vehicule_id).first()
-    
-    if not vehicule:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Véhicule avec l'ID {vehicule_id} non trouvé"
-        )
+    vehicule = await _get_vehicule_or_404(db, vehicule_id)
     
     # Calculer les jours avant expiration
-    from datetime import date
     today = date.today()
     
     stats = {
@@ -181,9 +516,8 @@ async def get_vehicule_stats(vehicule_id: int, db: Session = Depends(get_db)):
     
     # Générer les alertes
     for doc, jours in stats["jours_avant_expiration"].items():
-        if jours < 0:
-            stats["alertes"].append(f"{doc.title()} EXPIRÉ depuis {abs(jours)} jours")
-        elif jours <= 30:
-            stats["alertes"].append(f"{doc.title()} expire dans {jours} jours")
+        message = _alerte_document(doc, jours)
+        if message:
+            stats["alertes"].append(message)
     
     return stats
@@ -0,0 +1,35 @@
+"""
+Sélection de champs (?fields=id,immatriculation)
+Les noms sont validés contre le schéma de réponse de la route
+"""
+
+from typing import Collection, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+
+def parse_fields(raw: Optional[str], allowed: Collection[str], default: Sequence[str]) -> Tuple[str, ...]:
+    """'id, immatriculation' -> ('id', 'immatriculation') ; ValueError si un nom est inconnu"""
+    if raw is None or not raw.strip():
+        return tuple(default)
+    demandes = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    inconnus = [name for name in demandes if name not in allowed]
+    if inconnus:
+        raise ValueError(f"Champs inconnus : {', '.join(inconnus)}")
+    return demandes
+
+def fields_query(allowed: Sequence[str], default: Sequence[str]):
+    """Dependency : paramètre `fields` validé (400 si un champ n'existe pas)"""
+    allowed = tuple(allowed)
+
+    async def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Champs à renvoyer, séparés par des virgules, parmi : {', '.join(allowed)}"
+        )
+    ) -> Tuple[str, ...]:
+        try:
+            return parse_fields(fields, allowed, default)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return dependency
@@ -4,7 +4,7 @@ Remplace Django Forms et Serializers
 """
 
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional, Union
 from datetime import date, datetime
 
 class VehiculeBase(BaseModel):
@@ -81,3 +81,14 @@ class VehiculeSummary(BaseModel):
     
     class Config:
         from_attributes = True
+
+class VehiculePage(BaseModel):
+    """Page de véhicules paginée par curseur (keyset)"""
+    vehicules: List[VehiculeSummary]
+    next_cursor: Optional[str] = None
+    order_by: str = "id"
+
+class VehiculeBatch(BaseModel):
+    """Lecture groupée : véhicules dans l'ordre demandé, clés introuvables à part"""
+    vehicules: List[VehiculeSummary]
+    missing: List[Union[int, str]] = []
@@ -0,0 +1,157 @@
+"""
+Authentification JWT sans état
+Jetons signés (python-jose) vérifiés localement, sans accès base ;
+hachage des mots de passe (passlib) exécuté hors boucle d'événements
+"""
+
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+SECRET_KEY = os.getenv("SECRET_KEY") or ""
+if not SECRET_KEY or SECRET_KEY == "your-secret-key-here":
+    # Clé éphémère : les jetons ne survivent pas à un redémarrage
+    print("⚠️ SECRET_KEY non définie : clé aléatoire pour ce processus")
+    SECRET_KEY = secrets.token_urlsafe(48)
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "30"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+
+# Jetons déjà vérifiés gardés en mémoire (par worker)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+# Désactiver la protection des routes (développement, benchmarks)
+AUTH_DISABLED = os.getenv("AUTH_DISABLED", "").lower() in ("1", "true", "yes")
+
+# bcrypt pour les nouveaux mots de passe ; hachages Django (pbkdf2) acceptés
+pwd_context = CryptContext(schemes=["bcrypt", "django_pbkdf2_sha256"], deprecated="auto")
+
+class TokenCache:
+    """LRU jeton -> claims vérifiés ; une entrée expire avec son jeton"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+verified_tokens = TokenCache(TOKEN_CACHE_SIZE)
+
+# --- Mots de passe ---------------------------------------------------------
+
+async def verify_password(password: str, hashed: Optional[str]) -> bool:
+    """Vérification dans le pool de threads (bcrypt : ~250 ms de CPU)"""
+    if not hashed:
+        # Même coût qu'une vraie vérification : pas d'énumération par le temps de réponse
+        await run_in_threadpool(pwd_context.dummy_verify)
+        return False
+    try:
+        return await run_in_threadpool(pwd_context.verify, password, hashed)
+    except ValueError:
+        # Hachage dans un format inconnu (compte désactivé côté Django : "!...")
+        return False
+
+async def hash_password(password: str) -> str:
+    return await run_in_threadpool(pwd_context.hash, password)
+
+# --- Jetons ----------------------------------------------------------------
+
+def _create_token(user: dict, token_type: str, lifetime: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": str(user["user_id"]),
+        "username": user["username"],
+        "role": user["role"],
+        "type": token_type,
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    if token_type == "refresh":
+        claims["jti"] = uuid.uuid4().hex
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_access_token(user: dict) -> str:
+    return _create_token(user, "access", timedelta(minutes=ACCESS_TOKEN_MINUTES))
+
+def create_refresh_token(user: dict) -> str:
+    return _create_token(user, "refresh", timedelta(days=REFRESH_TOKEN_DAYS))
+
+def _invalid_token(detail: str = "Token invalide ou expiré") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """Claims d'un jeton valide ; la signature n'est vérifiée qu'au premier passage"""
+    claims = verified_tokens.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise _invalid_token()
+        verified_tokens.set(token, claims)
+    if claims.get("type") != token_type:
+        raise _invalid_token("Type de token incorrect")
+    return claims
+
+def user_from_claims(claims: dict) -> dict:
+    return {"user_id": int(claims["sub"]), "username": claims["username"], "role": claims["role"]}
+
+# --- Dependency ------------------------------------------------------------
+
+bearer = HTTPBearer(auto_error=False)
+
+def _user_from_token(token: Optional[str]) -> dict:
+    if AUTH_DISABLED:
+        return {"user_id": 0, "username": "anonyme", "role": "admin"}
+    if not token:
+        raise _invalid_token("Authentification requise")
+    return user_from_claims(decode_token(token, "access"))
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> dict:
+    """
+    Dependency : utilisateur du jeton d'accès (en-tête Authorization uniquement)
+    """
+    return _user_from_token(credentials.credentials if credentials else None)
+
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+    access_token: Optional[str] = Query(None, include_in_schema=False)
+) -> dict:
+    """
+    Dependency du flux SSE : EventSource ne peut pas poser d'en-tête, le jeton
+    y est aussi accepté en `?access_token=` (jamais sur les autres routes,
+    une URL finissant dans les journaux et l'historique)
+    """
+    return _user_from_token(credentials.credentials if credentials else access_token)
@@ -0,0 +1,278 @@
+"""
+Affectation automatique des missions en attente
+Matrices de faisabilité (documents, entretien, disponibilité) calculées avec
+NumPy, puis affectation de coût optimal (algorithme hongrois) par tours
+successifs : un véhicule libéré à 10h peut reprendre une mission à 14h.
+"""
+
+import os
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from models.utilisateur import Utilisateur
+from models.vehicule import Vehicule
+from services.intervals import mission_interval
+from services.search import normalize
+
+@lru_cache(maxsize=None)
+def _solveur():
+    """scipy.optimize (~0.4 s d'import) chargé au premier calcul, pas au démarrage"""
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:  # Repli glouton sans SciPy
+        return None
+    return linear_sum_assignment
+
+# Kilomètres depuis le dernier entretien au-delà desquels un véhicule est immobilisé
+SERVICE_KM = int(os.getenv("DISPATCH_SERVICE_KM", "10000"))
+
+# Fenêtre maximale traitée en un appel
+MAX_JOURS = int(os.getenv("DISPATCH_MAX_DAYS", "31"))
+
+# Mots-clés des observations -> niveau de priorité (le plus élevé l'emporte)
+PRIORITES = (
+    ("URGENCE", 3),
+    ("URGENT", 3),
+    ("PRIORITE", 2),
+    ("PRIORITAIRE", 2),
+    ("VIP", 1),
+    ("PONCTUALITE", 1),
+)
+
+DOCUMENTS = (
+    Vehicule.date_expiration_assurance,
+    Vehicule.date_expiration_controle_technique,
+    Vehicule.date_expiration_vignette,
+    Vehicule.date_expiration_stationnement,
+)
+
+def priorite(observations: Optional[str]) -> int:
+    """'Urgence médicale - Priorité absolue' -> 3"""
+    texte = normalize(observations)
+    return max((niveau for mot, niveau in PRIORITES if mot in texte), default=0)
+
+def _minutes(moment: datetime) -> int:
+    """Horodatage entier (minutes) pour les comparaisons vectorisées"""
+    return moment.toordinal() * 1440 + moment.hour * 60 + moment.minute
+
+def _periode(mission: dict) -> Tuple[int, int]:
+    debut, fin = mission_interval(mission["date_souhaitee"], mission["heure_depart"], mission["heure_retour"])
+    return _minutes(debut), _minutes(fin)
+
+class _Occupation:
+    """Créneaux déjà pris, par colonne de ressource"""
+
+    def __init__(self, ids: np.ndarray):
+        self.colonnes = {int(resource_id): j for j, resource_id in enumerate(ids)}
+        self.taille = len(ids)
+        self.ressources: List[int] = []
+        self.debuts: List[int] = []
+        self.fins: List[int] = []
+
+    def add(self, resource_id: Optional[int], debut: int, fin: int) -> None:
+        colonne = self.colonnes.get(resource_id)
+        if colonne is not None:
+            self.ressources.append(colonne)
+            self.debuts.append(debut)
+            self.fins.append(fin)
+
+    def charge(self) -> np.ndarray:
+        """Nombre de créneaux pris par ressource"""
+        return np.bincount(np.array(self.ressources, dtype=np.intp), minlength=self.taille)
+
+    def occupees(self, debuts: np.ndarray, fins: np.ndarray) -> np.ndarray:
+        """Matrice missions x ressources : True si la ressource est prise sur le créneau"""
+        if not self.ressources:
+            return np.zeros((len(debuts), self.taille), dtype=bool)
+        pris_debut = np.array(self.debuts)
+        pris_fin = np.array(self.fins)
+        chevauche = (pris_debut[None, :] < fins[:, None]) & (pris_fin[None, :] > debuts[:, None])
+        appartient = np.zeros((len(self.ressources), self.taille), dtype=np.int32)
+        appartient[np.arange(len(self.ressources)), self.ressources] = 1
+        return (chevauche.astype(np.int32) @ appartient) > 0
+
+def _assign(faisable: np.ndarray, poids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Couplage de poids maximal restreint aux paires faisables"""
+    if not faisable.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    gains = np.where(faisable, poids, 0.0)
+    linear_sum_assignment = _solveur()
+    if linear_sum_assignment is not None:
+        lignes, colonnes = linear_sum_assignment(-gains)
+    else:
+        lignes_f, colonnes_f = np.nonzero(faisable)
+        ordre = np.argsort(-gains[lignes_f, colonnes_f], kind="stable")
+        lignes_prises, colonnes_prises, lignes, colonnes = set(), set(), [], []
+        for i, j in zip(lignes_f[ordre], colonnes_f[ordre]):
+            if i not in lignes_prises and j not in colonnes_prises:
+                lignes_prises.add(i)
+                colonnes_prises.add(j)
+                lignes.append(i)
+                colonnes.append(j)
+        lignes, colonnes = np.array(lignes, dtype=np.intp), np.array(colonnes, dtype=np.intp)
+    retenues = faisable[lignes, colonnes]
+    return lignes[retenues], colonnes[retenues]
+
+def _reservations(missions: Sequence[dict], ids: np.ndarray, champ: str, debuts: np.ndarray, fins: np.ndarray) -> np.ndarray:
+    """
+    Matrice missions x ressources : True si une AUTRE mission en attente a
+    imposé cette ressource sur un créneau qui chevauche (elle lui reste réservée)
+    """
+    colonnes = {int(resource_id): j for j, resource_id in enumerate(ids)}
+    reservees = np.zeros((len(missions), len(ids)), dtype=bool)
+    for j, mission in enumerate(missions):
+        colonne = colonnes.get(mission.get(champ))
+        if colonne is None:
+            continue
+        chevauche = (debuts < fins[j]) & (fins > debuts[j])
+        chevauche[j] = False
+        reservees[chevauche, colonne] = True
+    return reservees
+
+def solve(
+    missions: Sequence[dict],
+    vehicules: Sequence[dict],
+    chauffeurs: Sequence[int],
+    occupations: Sequence[dict],
+) -> Tuple[Dict[int, dict], Dict[int, str]]:
+    """
+    Affecter véhicule et chauffeur aux missions
+    Les niveaux de priorité sont traités du plus élevé au plus bas : une mission
+    urgente choisit ses ressources avant les autres. Chaque tour résout un
+    couplage missions x véhicules puis missions x chauffeurs sur les créneaux libres.
+    Retourne ({mission_id: affectation}, {mission_id: raison du refus})
+    """
+    n = len(missions)
+    if n == 0:
+        return {}, {}
+
+    periodes = np.array([_periode(m) for m in missions], dtype=np.int64).reshape(n, 2)
+    debuts, fins = periodes[:, 0], periodes[:, 1]
+    jours = np.array([m["date_souhaitee"].toordinal() for m in missions])
+    niveaux = np.array([priorite(m.get("observations")) for m in missions])
+
+    v_ids = np.array([v["id"] for v in vehicules], dtype=np.int64)
+    v_expiration = np.array([v["expiration"].toordinal() for v in vehicules], dtype=np.int64)
+    v_usure = np.array([min(v["km_depuis_entretien"] / SERVICE_KM, 1.0) for v in vehicules], dtype=float)
+    c_ids = np.array(chauffeurs, dtype=np.int64)
+
+    # Faisabilité statique : documents valides le jour de la mission, ressource imposée
+    vehicule_ok = v_expiration[None, :] >= jours[:, None]
+    chauffeur_ok = np.ones((n, len(c_ids)), dtype=bool)
+    for i, mission in enumerate(missions):
+        if mission.get("vehicule_id") is not None:
+            vehicule_ok[i] &= v_ids == mission["vehicule_id"]
+        if mission.get("chauffeur_id") is not None:
+            chauffeur_ok[i] &= c_ids == mission["chauffeur_id"]
+
+    # Ressources imposées par une mission en attente : jamais données à une autre
+    # mission du même créneau (si elle n'est pas servie, elle figure dans les refus)
+    reservees_v = _reservations(missions, v_ids, "vehicule_id", debuts, fins)
+    reservees_c = _reservations(missions, c_ids, "chauffeur_id", debuts, fins)
+
+    occupation_v = _Occupation(v_ids)
+    occupation_c = _Occupation(c_ids)
+    for occupation in occupations:
+        debut, fin = _periode(occupation)
+        occupation_v.add(occupation["vehicule_id"], debut, fin)
+        occupation_c.add(occupation["chauffeur_id"], debut, fin)
+
+    # Préférences (< 1, ne priment jamais sur le nombre de missions servies) :
+    # véhicules les moins usés, chauffeurs les moins chargés
+    preference_v = 0.5 * (1.0 - v_usure)
+
+    affectations: Dict[int, dict] = {}
+    for niveau in sorted(set(niveaux.tolist()), reverse=True):
+        restantes = np.flatnonzero(niveaux == niveau)
+        while restantes.size:
+            # Une mission sans chauffeur libre ne dispute pas les véhicules
+            servables = (
+                chauffeur_ok[restantes] & ~reservees_c[restantes] & ~occupation_c.occupees(debuts[restantes], fins[restantes])
+            ).any(axis=1)
+            libres_v = vehicule_ok[restantes] & ~reservees_v[restantes] & ~occupation_v.occupees(debuts[restantes], fins[restantes])
+            libres_v &= servables[:, None]
+            lignes, colonnes_v = _assign(libres_v, 1.0 + np.broadcast_to(preference_v, libres_v.shape))
+            if not lignes.size:
+                break
+            candidates = restantes[lignes]
+            preference_c = 0.5 / (1.0 + occupation_c.charge())
+            libres_c = chauffeur_ok[candidates] & ~reservees_c[candidates] & ~occupation_c.occupees(debuts[candidates], fins[candidates])
+            lignes_c, colonnes_c = _assign(libres_c, 1.0 + np.broadcast_to(preference_c, libres_c.shape))
+            if not lignes_c.size:
+                break
+            for k, colonne_c in zip(lignes_c, colonnes_c):
+                i = candidates[k]
+                vehicule_id, chauffeur_id = int(v_ids[colonnes_v[k]]), int(c_ids[colonne_c])
+                occupation_v.add(vehicule_id, debuts[i], fins[i])
+                occupation_c.add(chauffeur_id, debuts[i], fins[i])
+                affectations[missions[i]["id"]] = {
+                    "mission_id": missions[i]["id"],
+                    "vehicule_id": vehicule_id,
+                    "chauffeur_id": chauffeur_id,
+                    "priorite": int(niveau),
+                }
+            restantes = restantes[~np.isin(restantes, candidates[lignes_c])]
+
+    refus: Dict[int, str] = {}
+    for i, mission in enumerate(missions):
+        if mission["id"] in affectations:
+            continue
+        if not vehicule_ok[i].any():
+            refus[mission["id"]] = "Aucun véhicule conforme (documents, entretien ou véhicule imposé)"
+        elif not chauffeur_ok[i].any():
+            refus[mission["id"]] = "Aucun chauffeur actif disponible"
+        else:
+            refus[mission["id"]] = "Aucun véhicule ou chauffeur libre sur ce créneau"
+    return affectations, refus
+
+async def load_vehicules(db: AsyncSession, debut: date) -> List[dict]:
+    """Véhicules hors entretien, avec la première date d'expiration de leurs documents"""
+    usure = func.coalesce(Vehicule.kilometrage_actuel, 0) - func.coalesce(Vehicule.kilometrage_dernier_entretien, 0)
+    result = await db.execute(
+        select(Vehicule.id, usure, *DOCUMENTS).where(usure < SERVICE_KM).order_by(Vehicule.id)
+    )
+    vehicules = []
+    for vehicule_id, km, *expirations in result:
+        expiration = min(expirations)
+        if expiration >= debut:
+            vehicules.append({"id": vehicule_id, "km_depuis_entretien": max(km, 0), "expiration": expiration})
+    return vehicules
+
+async def load_chauffeurs(db: AsyncSession) -> List[int]:
+    """Chauffeurs actifs"""
+    result = await db.execute(
+        select(Utilisateur.id)
+        .where(Utilisateur.role == "chauffeur", Utilisateur.is_active.is_(True))
+        .order_by(Utilisateur.id)
+    )
+    return result.scalars().all()
+
+async def plan_dispatch(db: AsyncSession, repository, debut: date, fin: date) -> dict:
+    """Calculer les affectations de la fenêtre [debut, fin] sans rien écrire"""
+    missions = await repository.pending_dispatch(debut, fin)
+    vehicules = await load_vehicules(db, debut)
+    chauffeurs = await load_chauffeurs(db)
+    occupations = await repository.occupations(
+        debut - timedelta(days=1), fin + timedelta(days=1), exclude={m["id"] for m in missions}
+    )
+
+    # Calcul numpy/SciPy (et import de SciPy au premier appel) hors de la boucle d'événements
+    depart = time.perf_counter()
+    affectations, refus = await run_in_threadpool(solve, missions, vehicules, chauffeurs, occupations)
+    duree = (time.perf_counter() - depart) * 1000
+
+    return {
+        "affectations": list(affectations.values()),
+        "non_affectees": [{"mission_id": mission_id, "raison": raison} for mission_id, raison in refus.items()],
+        "missions_analysees": len(missions),
+        "vehicules_disponibles": len(vehicules),
+        "chauffeurs_disponibles": len(chauffeurs),
+        "duree_calcul_ms": round(duree, 1),
+    }
@@ -0,0 +1,129 @@
+"""
+Diffusion des changements de missions (Server-Sent Events)
+Un événement est sérialisé une seule fois puis distribué aux abonnés dont
+les filtres correspondent ; chaque abonné a une file bornée : un client
+lent perd des événements (et en est averti) au lieu de retenir la mémoire.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+# Événements en attente par abonné avant d'écarter les plus anciens
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+# Historique conservé pour la reprise (en-tête Last-Event-ID)
+HISTORY_SIZE = int(os.getenv("EVENTS_HISTORY_SIZE", "1000"))
+
+# Champs filtrables d'une mission
+FILTRES = ("chauffeur_id", "vehicule_id", "statut")
+
+class Event:
+    """Événement prêt à l'envoi (trame SSE encodée une fois pour tous)"""
+
+    __slots__ = ("id", "cles", "trame")
+
+    def __init__(self, event_id: int, type: str, mission: dict, avant: Optional[dict] = None):
+        self.id = event_id
+        # Un abonné est notifié si la mission correspondait avant OU après
+        self.cles = {
+            (champ, etat[champ])
+            for etat in (mission, avant) if etat
+            for champ in FILTRES if etat.get(champ) is not None
+        }
+        data = {"type": type, "mission": mission}
+        if avant is not None:
+            data["avant"] = {champ: avant.get(champ) for champ in FILTRES}
+        self.trame = f"id: {event_id}\nevent: {type}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+class Subscription:
+    """File bornée d'un client ; `perdus` compte les événements écartés"""
+
+    __slots__ = ("filtres", "queue", "perdus")
+
+    def __init__(self, filtres: Dict[str, object], size: int):
+        self.filtres = filtres
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.perdus = 0
+
+    def matches(self, event: Event) -> bool:
+        return all((champ, valeur) in event.cles for champ, valeur in self.filtres.items())
+
+    def push(self, event: Event) -> None:
+        """Ne bloque jamais l'écrivain : la plus ancienne trame cède la place"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.perdus += 1
+            self.queue.put_nowait(event)
+
+class EventBroker:
+    """
+    Abonnés indexés par filtre : une publication ne parcourt que les abonnés
+    concernés, un abonné inactif ne coûte qu'une file vide.
+    Diffusion limitée au processus (un worker uvicorn).
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, history_size: int = HISTORY_SIZE):
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._history: deque = deque(maxlen=history_size)
+        self._tous: Set[Subscription] = set()
+        self._par_cle: Dict[Tuple[str, object], Set[Subscription]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tous) + sum(len(abonnes) for abonnes in self._par_cle.values())
+
+    @staticmethod
+    def _cle(filtres: Dict[str, object]) -> Optional[Tuple[str, object]]:
+        """Clé d'index : le premier filtre posé (les autres sont vérifiés à la diffusion)"""
+        for champ in FILTRES:
+            if champ in filtres:
+                return champ, filtres[champ]
+        return None
+
+    def subscribe(self, **filtres) -> Subscription:
+        filtres = {champ: valeur for champ, valeur in filtres.items() if valeur is not None}
+        subscription = Subscription(filtres, self.queue_size)
+        cle = self._cle(filtres)
+        if cle is None:
+            self._tous.add(subscription)
+        else:
+            self._par_cle.setdefault(cle, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        cle = self._cle(subscription.filtres)
+        if cle is None:
+            self._tous.discard(subscription)
+            return
+        abonnes = self._par_cle.get(cle)
+        if abonnes is not None:
+            abonnes.discard(subscription)
+            if not abonnes:
+                del self._par_cle[cle]
+
+    def publish(self, type: str, mission: dict, avant: Optional[dict] = None) -> Event:
+        """Diffuser un changement (appelé depuis la boucle d'événements)"""
+        event = Event(next(self._ids), type, mission, avant)
+        self._history.append(event)
+        for subscription in self._tous:
+            subscription.push(event)
+        for cle in event.cles:
+            for subscription in self._par_cle.get(cle, ()):
+                if subscription.matches(event):
+                    subscription.push(event)
+        return event
+
+    def replay(self, subscription: Subscription, last_event_id: int) -> Optional[List[Event]]:
+        """Événements manqués depuis `last_event_id` ; None si l'historique ne remonte pas si loin"""
+        if not self._history or self._history[0].id > last_event_id + 1 or self._history[-1].id < last_event_id:
+            # Historique trop court, ou identifiant d'un processus précédent
+            return None
+        return [event for event in self._history if event.id > last_event_id and subscription.matches(event)]
+
+mission_events = EventBroker()
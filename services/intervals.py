@@ -0,0 +1,77 @@
+"""
+Index d'intervalles par ressource (véhicule, chauffeur)
+Détection des chevauchements de missions en O(log n + k)
+"""
+
+from bisect import bisect_left, insort
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Statuts qui n'occupent plus la ressource
+STATUTS_INACTIFS = ("annulee", "terminee")
+
+def mission_interval(
+    date_souhaitee: date,
+    heure_depart: Optional[time],
+    heure_retour: Optional[time],
+) -> Tuple[datetime, datetime]:
+    """
+    Période [début, fin) occupée par une mission
+    Sans heure de départ : minuit ; sans heure de retour : fin de journée ;
+    retour avant le départ : retour le lendemain
+    """
+    debut = datetime.combine(date_souhaitee, heure_depart or time(0, 0))
+    if heure_retour is None:
+        fin = datetime.combine(date_souhaitee + timedelta(days=1), time(0, 0))
+    else:
+        fin = datetime.combine(date_souhaitee, heure_retour)
+        if fin <= debut:
+            fin += timedelta(days=1)
+    return debut, fin
+
+class IntervalIndex:
+    """
+    Intervalles triés par début pour chaque ressource
+    Un intervalle qui chevauche [debut, fin) commence forcément dans
+    [debut - plus_longue_duree, fin) : recherche dichotomique puis filtre
+    """
+
+    def __init__(self):
+        self._intervals: Dict[Hashable, List[Tuple[datetime, datetime, int]]] = {}
+        self._max_duree: Dict[Hashable, timedelta] = {}
+
+    def add(self, resource: Hashable, debut: datetime, fin: datetime, mission_id: int) -> None:
+        insort(self._intervals.setdefault(resource, []), (debut, fin, mission_id))
+        if fin - debut > self._max_duree.get(resource, timedelta(0)):
+            self._max_duree[resource] = fin - debut
+
+    def remove(self, resource: Hashable, debut: datetime, fin: datetime, mission_id: int) -> None:
+        intervals = self._intervals.get(resource)
+        if not intervals:
+            return
+        position = bisect_left(intervals, (debut, fin, mission_id))
+        if position < len(intervals) and intervals[position] == (debut, fin, mission_id):
+            del intervals[position]
+        if not intervals:
+            del self._intervals[resource]
+            self._max_duree.pop(resource, None)
+
+    def overlapping(
+        self,
+        resource: Hashable,
+        debut: datetime,
+        fin: datetime,
+        exclude: Optional[int] = None,
+    ) -> List[int]:
+        """Ids des missions de `resource` qui chevauchent [debut, fin)"""
+        intervals = self._intervals.get(resource)
+        if not intervals:
+            return []
+        start = bisect_left(intervals, (debut - self._max_duree[resource],))
+        ids = []
+        for autre_debut, autre_fin, mission_id in intervals[start:]:
+            if autre_debut >= fin:
+                break
+            if autre_fin > debut and mission_id != exclude:
+                ids.append(mission_id)
+        return ids
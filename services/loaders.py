@@ -0,0 +1,103 @@
+"""
+Chargement groupé des relations des missions (façon DataLoader)
+Propre à une requête HTTP : les ids référencés par une page de missions sont
+collectés, chaque table est lue en un seul SELECT ... IN et les lignes sont
+mémorisées pour le reste de la requête. Coût constant, quelle que soit la page.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from http_cache import version
+from models.utilisateur import Utilisateur
+from models.vehicule import Vehicule
+
+class BatchLoader:
+    """Lignes d'une table par clé primaire : une requête par lot d'ids inconnus"""
+
+    def __init__(self, db: AsyncSession, model, columns: Sequence):
+        self.db = db
+        self.model = model
+        self.columns = tuple(columns)
+        self._rows: Dict[int, Optional[object]] = {}
+
+    async def load_many(self, ids: Iterable[int]) -> None:
+        """Charger les ids pas encore vus (absents mémorisés à None)"""
+        manquants = [cle for cle in dict.fromkeys(ids) if cle is not None and cle not in self._rows]
+        if not manquants:
+            return
+        result = await self.db.execute(select(*self.columns).where(self.model.id.in_(manquants)))
+        self._rows.update(dict.fromkeys(manquants))
+        self._rows.update({row.id: row for row in result})
+
+    def get(self, cle: int):
+        return self._rows.get(cle)
+
+def _nom(row) -> str:
+    return f"{row.first_name} {row.last_name}".strip() or row.username
+
+# Représentations imbriquées (mêmes clés que les missions de démonstration)
+def _vehicule(row) -> dict:
+    return {"id": row.id, "immatriculation": row.immatriculation, "marque": row.marque, "modele": row.modele}
+
+def _chauffeur(row) -> dict:
+    return {"id": row.id, "nom": _nom(row), "telephone": row.telephone}
+
+def _demandeur(row) -> dict:
+    return {"id": row.id, "nom": _nom(row), "departement": row.departement}
+
+class MissionLoaders:
+    """Véhicules et utilisateurs référencés par des missions ; chauffeurs et demandeurs partagent une requête"""
+
+    def __init__(self, db: AsyncSession):
+        self.vehicules = BatchLoader(db, Vehicule, (
+            Vehicule.id, Vehicule.immatriculation, Vehicule.marque, Vehicule.modele,
+            Vehicule.date_creation, Vehicule.date_modification
+        ))
+        self.utilisateurs = BatchLoader(db, Utilisateur, (
+            Utilisateur.id, Utilisateur.username, Utilisateur.first_name, Utilisateur.last_name,
+            Utilisateur.telephone, Utilisateur.departement
+        ))
+        self._relations = {
+            "vehicule": (self.vehicules, _vehicule),
+            "chauffeur": (self.utilisateurs, _chauffeur),
+            "demandeur": (self.utilisateurs, _demandeur),
+        }
+
+    async def resolve(self, missions: List[dict]) -> List[dict]:
+        """Remplacer les références {"id": n} par la ligne liée ; absentes laissées telles quelles"""
+        ids: Dict[BatchLoader, list] = {}
+        for relation, (loader, _) in self._relations.items():
+            ids.setdefault(loader, []).extend(
+                mission[relation]["id"] for mission in missions if mission.get(relation)
+            )
+        # Séquentiel : une AsyncSession n'exécute qu'une requête à la fois
+        for loader, cles in ids.items():
+            await loader.load_many(cles)
+
+        for mission in missions:
+            for relation, (loader, representation) in self._relations.items():
+                reference = mission.get(relation)
+                row = loader.get(reference["id"]) if reference else None
+                if row is not None:
+                    mission[relation] = representation(row)
+        return missions
+
+    async def load(self, references: Dict[str, Optional[int]]) -> None:
+        """Charger les lignes d'une mission par relation ({"vehicule": 3, "chauffeur": 7})"""
+        await self.resolve([{relation: {"id": cle} for relation, cle in references.items() if cle is not None}])
+
+    def version(self, relation: str, cle: Optional[int]) -> Optional[str]:
+        """
+        Version d'une relation déjà chargée (None si inconnue) : dates du véhicule ;
+        pour chauffeur et demandeur (sans date de modification), le contenu imbriqué lui-même
+        """
+        loader, representation = self._relations[relation]
+        row = loader.get(cle)
+        if row is None:
+            return None
+        if relation == "vehicule":
+            return version(row.date_creation, row.date_modification)
+        return repr(sorted(representation(row).items()))
@@ -0,0 +1,358 @@
+"""
+Stockage mémoire indexé des missions
+Accès O(1) par id, index secondaires par statut / chauffeur / véhicule
+et index trié par date pour les filtres de période
+"""
+
+import itertools
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from services.intervals import IntervalIndex, STATUTS_INACTIFS, mission_interval
+
+# Champs modifiables via create / update
+FIELDS = (
+    "destination", "lieu_depart", "date_souhaitee", "heure_depart", "heure_retour",
+    "vehicule_id", "chauffeur_id", "demandeur_id", "statut", "distance_parcourue",
+    "observations",
+)
+
+# Relations dont les données de référence sont partagées entre missions
+RELATIONS = ("vehicule", "chauffeur", "demandeur")
+
+class MissionConflict(Exception):
+    """Véhicule ou chauffeur déjà engagé sur une mission qui chevauche"""
+
+    def __init__(self, conflits: List[dict]):
+        super().__init__(f"{len(conflits)} mission(s) en conflit")
+        self.conflits = conflits
+
+class MissionRecord:
+    """Mission compacte : identifiants plats, pas de dictionnaires imbriqués"""
+
+    __slots__ = FIELDS + ("id", "date_creation", "date_modification")
+
+    def __init__(self, id: int, **fields):
+        self.id = id
+        self.date_creation = fields.pop("date_creation", None) or datetime.now()
+        self.date_modification = fields.pop("date_modification", None)
+        for name in FIELDS:
+            setattr(self, name, fields.get(name))
+
+def _as_date(value) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def _as_time(value) -> Optional[time]:
+    if value is None or isinstance(value, time):
+        return value
+    return datetime.strptime(value, "%H:%M").time()
+
+def _interval(fields) -> Tuple[datetime, datetime]:
+    """Période occupée, depuis un MissionRecord ou un dict de champs"""
+    get = fields.get if isinstance(fields, dict) else lambda name: getattr(fields, name)
+    return mission_interval(
+        _as_date(get("date_souhaitee")), _as_time(get("heure_depart")), _as_time(get("heure_retour"))
+    )
+
+# Champs obligatoires (colonnes NOT NULL de core_course) : None refusé
+REQUIRED = ("destination", "date_souhaitee", "statut", "distance_parcourue")
+
+def _check_required(fields: dict) -> None:
+    """ValueError avant toute modification des index si un champ obligatoire est None"""
+    manquants = [name for name in REQUIRED if fields.get(name) is None]
+    if manquants:
+        raise ValueError(f"Champs obligatoires sans valeur: {', '.join(manquants)}")
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+class MissionStore:
+    """
+    Missions en mémoire (mode démonstration)
+    Toutes les opérations sont protégées par un verrou : les index restent
+    cohérents même si des handlers s'exécutent dans le pool de threads
+    """
+
+    def __init__(self, missions: Iterable[dict] = ()):
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, MissionRecord] = {}
+        self._by_statut: Dict[str, Set[int]] = {}
+        self._by_chauffeur: Dict[int, Set[int]] = {}
+        self._by_vehicule: Dict[int, Set[int]] = {}
+        self._by_date: List[Tuple[date, int]] = []
+        # Compteurs du tableau de bord, maintenus à chaque écriture
+        self._count_by_date: Dict[date, int] = {}
+        self._distance_totale = 0
+        # Occupation des ressources par les missions actives
+        self._intervals = IntervalIndex()
+        self._references: Dict[str, Dict[int, dict]] = {relation: {} for relation in RELATIONS}
+        self._ids = itertools.count(1)
+        for mission in missions:
+            self.load(mission)
+
+    # --- Index -------------------------------------------------------------
+
+    def _index(self, record: MissionRecord) -> None:
+        # Valeurs dérivées calculées avant toute écriture : une erreur n'indexe rien à moitié
+        statut = record.statut.lower()
+        occupations = [(resource, *_interval(record)) for resource in self._resources(record)]
+        self._by_id[record.id] = record
+        self._by_statut.setdefault(statut, set()).add(record.id)
+        if record.chauffeur_id is not None:
+            self._by_chauffeur.setdefault(record.chauffeur_id, set()).add(record.id)
+        if record.vehicule_id is not None:
+            self._by_vehicule.setdefault(record.vehicule_id, set()).add(record.id)
+        insort(self._by_date, (record.date_souhaitee, record.id))
+        self._count_by_date[record.date_souhaitee] = self._count_by_date.get(record.date_souhaitee, 0) + 1
+        self._distance_totale += record.distance_parcourue or 0
+        for occupation in occupations:
+            self._intervals.add(*occupation, record.id)
+
+    def _unindex(self, record: MissionRecord) -> None:
+        del self._by_id[record.id]
+        self._discard(self._by_statut, record.statut.lower(), record.id)
+        self._discard(self._by_chauffeur, record.chauffeur_id, record.id)
+        self._discard(self._by_vehicule, record.vehicule_id, record.id)
+        key = (record.date_souhaitee, record.id)
+        position = bisect_left(self._by_date, key)
+        if position < len(self._by_date) and self._by_date[position] == key:
+            del self._by_date[position]
+        self._discard_count(self._count_by_date, record.date_souhaitee)
+        self._distance_totale -= record.distance_parcourue or 0
+        for resource in self._resources(record):
+            self._intervals.remove(resource, *_interval(record), record.id)
+
+    @staticmethod
+    def _resources(fields) -> List[Tuple[str, int]]:
+        """Ressources occupées : ("vehicule", id) / ("chauffeur", id) si mission active"""
+        get = fields.get if isinstance(fields, dict) else lambda name: getattr(fields, name)
+        if (get("statut") or "").lower() in STATUTS_INACTIFS:
+            return []
+        return [
+            (relation, get(f"{relation}_id"))
+            for relation in ("vehicule", "chauffeur")
+            if get(f"{relation}_id") is not None
+        ]
+
+    def conflicts(self, fields: dict, exclude: Optional[int] = None) -> List[MissionRecord]:
+        """Missions actives qui partagent un véhicule / chauffeur sur la même période"""
+        with self._lock:
+            resources = self._resources(fields)
+            if not resources:
+                return []
+            debut, fin = _interval(fields)
+            ids = set()
+            for resource in resources:
+                ids.update(self._intervals.overlapping(resource, debut, fin, exclude))
+            return sorted((self._by_id[mission_id] for mission_id in ids), key=lambda r: r.id)
+
+    def _check_conflicts(self, fields: dict, exclude: Optional[int] = None) -> None:
+        conflits = self.conflicts(fields, exclude)
+        if conflits:
+            raise MissionConflict([self.to_dict(record) for record in conflits])
+
+    @staticmethod
+    def _discard_count(counts: Dict, key) -> None:
+        remaining = counts.get(key, 0) - 1
+        if remaining > 0:
+            counts[key] = remaining
+        else:
+            counts.pop(key, None)
+
+    @staticmethod
+    def _discard(index: Dict, key, mission_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(mission_id)
+            if not ids:
+                del index[key]
+
+    # --- Écritures ---------------------------------------------------------
+
+    def load(self, mission: dict) -> MissionRecord:
+        """Charger une mission au format historique (relations imbriquées)"""
+        fields = {name: mission.get(name) for name in FIELDS}
+        for relation in RELATIONS:
+            nested = mission.get(relation)
+            if nested:
+                fields[f"{relation}_id"] = nested["id"]
+                self._references[relation][nested["id"]] = dict(nested)
+        fields["date_souhaitee"] = _as_date(fields["date_souhaitee"])
+        fields["date_creation"] = _as_datetime(mission.get("date_creation"))
+        fields["date_modification"] = _as_datetime(mission.get("date_modification"))
+        with self._lock:
+            record = MissionRecord(mission["id"], **fields)
+            self._index(record)
+            # Le générateur d'id reprend après le plus grand id chargé
+            self._ids = itertools.count(max(self._by_id) + 1)
+        return record
+
+    def create(self, **fields) -> MissionRecord:
+        """Créer une mission ; MissionConflict si une ressource est déjà prise"""
+        fields["date_souhaitee"] = _as_date(fields.get("date_souhaitee"))
+        with self._lock:
+            self._check_conflicts(fields)
+            record = MissionRecord(next(self._ids), **fields)
+            self._index(record)
+        return record
+
+    def update(self, mission_id: int, changes: dict) -> Optional[MissionRecord]:
+        """Appliquer des modifications et réindexer ; None si absente, MissionConflict si chevauchement"""
+        with self._lock:
+            record = self._by_id.get(mission_id)
+            if record is None:
+                return None
+            candidate = {name: getattr(record, name) for name in FIELDS}
+            candidate.update((name, value) for name, value in changes.items() if name in FIELDS)
+            _check_required(candidate)
+            self._check_conflicts(candidate, exclude=mission_id)
+            avant = {name: getattr(record, name) for name in FIELDS + ("date_modification",)}
+            self._unindex(record)
+            try:
+                for name, value in changes.items():
+                    if name in FIELDS:
+                        setattr(record, name, _as_date(value) if name == "date_souhaitee" else value)
+                record.date_modification = datetime.now()
+                self._index(record)
+            except Exception:
+                # Mission rétablie et réindexée telle qu'avant la modification
+                for name, value in avant.items():
+                    setattr(record, name, value)
+                self._index(record)
+                raise
+        return record
+
+    def update_many(self, changes: Dict[int, dict]) -> List[MissionRecord]:
+        """Appliquer plusieurs modifications en tout ou rien (MissionConflict annule le lot)"""
+        with self._lock:
+            appliquees = []
+            try:
+                for mission_id, fields in changes.items():
+                    record = self._by_id.get(mission_id)
+                    if record is None:
+                        continue
+                    avant = {name: getattr(record, name) for name in fields if name in FIELDS}
+                    appliquees.append((record, avant, record.date_modification))
+                    self.update(mission_id, fields)
+            except MissionConflict:
+                for record, avant, date_modification in reversed(appliquees):
+                    self._unindex(record)
+                    for name, value in avant.items():
+                        setattr(record, name, value)
+                    record.date_modification = date_modification
+                    self._index(record)
+                raise
+        return [record for record, _, _ in appliquees]
+
+    def delete(self, mission_id: int) -> Optional[MissionRecord]:
+        with self._lock:
+            record = self._by_id.get(mission_id)
+            if record is not None:
+                self._unindex(record)
+        return record
+
+    # --- Lectures ----------------------------------------------------------
+
+    def get(self, mission_id: int) -> Optional[MissionRecord]:
+        return self._by_id.get(mission_id)
+
+    def count(self, statut: Optional[str] = None) -> int:
+        if statut is None:
+            return len(self._by_id)
+        return len(self._by_statut.get(statut.lower(), ()))
+
+    def query(
+        self,
+        statut: Optional[str] = None,
+        date_debut: Optional[date] = None,
+        date_fin: Optional[date] = None,
+        chauffeur_id: Optional[int] = None,
+        vehicule_id: Optional[int] = None,
+    ) -> List[MissionRecord]:
+        """Missions filtrées, triées par (date, id) : intersection des index, le plus petit d'abord"""
+        with self._lock:
+            candidates = []
+            if statut:
+                candidates.append(self._by_statut.get(statut.lower(), set()))
+            if chauffeur_id:
+                candidates.append(self._by_chauffeur.get(chauffeur_id, set()))
+            if vehicule_id:
+                candidates.append(self._by_vehicule.get(vehicule_id, set()))
+            if date_debut or date_fin:
+                start = bisect_left(self._by_date, (date_debut, 0)) if date_debut else 0
+                end = bisect_right(self._by_date, (date_fin, float("inf"))) if date_fin else len(self._by_date)
+                candidates.append({mission_id for _, mission_id in self._by_date[start:end]})
+
+            if not candidates:
+                return [self._by_id[mission_id] for _, mission_id in self._by_date]
+            candidates.sort(key=len)
+            ids = candidates[0].intersection(*candidates[1:])
+            records = [self._by_id[mission_id] for mission_id in ids]
+            records.sort(key=lambda record: (record.date_souhaitee, record.id))
+            return records
+
+    def dashboard(self, today: date) -> dict:
+        """Compteurs maintenus incrémentalement : lecture O(nombre de statuts)"""
+        with self._lock:
+            return {
+                "stats_by_status": {statut: len(ids) for statut, ids in self._by_statut.items()},
+                "distance_totale": self._distance_totale,
+                "missions_aujourd_hui": self._count_by_date.get(today, 0),
+            }
+
+    def verify(self, repair: bool = False) -> List[dict]:
+        """Recalculer les compteurs depuis les missions et lister les écarts"""
+        with self._lock:
+            by_date: Dict[date, int] = {}
+            distance = 0
+            for record in self._by_id.values():
+                by_date[record.date_souhaitee] = by_date.get(record.date_souhaitee, 0) + 1
+                distance += record.distance_parcourue or 0
+            ecarts = [
+                {"compteur": "missions_par_date", "cle": day.isoformat(),
+                 "maintenu": self._count_by_date.get(day, 0), "recalcule": by_date.get(day, 0)}
+                for day in sorted(set(by_date) | set(self._count_by_date))
+                if by_date.get(day, 0) != self._count_by_date.get(day, 0)
+            ]
+            if distance != self._distance_totale:
+                ecarts.append({"compteur": "distance_totale", "cle": None,
+                               "maintenu": self._distance_totale, "recalcule": distance})
+            if repair:
+                self._count_by_date, self._distance_totale = by_date, distance
+            return ecarts
+
+    def reference(self, relation: str, reference_id: Optional[int]) -> Optional[dict]:
+        """Données de référence partagées (véhicule, chauffeur, demandeur)"""
+        if reference_id is None:
+            return None
+        return self._references[relation].get(reference_id, {"id": reference_id})
+
+    def to_dict(self, record: MissionRecord) -> dict:
+        """Représentation JSON historique (relations imbriquées)"""
+        mission = {
+            "id": record.id,
+            "destination": record.destination,
+            "lieu_depart": record.lieu_depart,
+            "date_souhaitee": record.date_souhaitee.isoformat() if record.date_souhaitee else None,
+            "heure_depart": record.heure_depart,
+            "heure_retour": record.heure_retour,
+            "vehicule_id": record.vehicule_id,
+            "chauffeur_id": record.chauffeur_id,
+            "demandeur_id": record.demandeur_id,
+            "vehicule": self.reference("vehicule", record.vehicule_id),
+            "chauffeur": self.reference("chauffeur", record.chauffeur_id),
+            "demandeur": self.reference("demandeur", record.demandeur_id),
+            "statut": record.statut,
+            "distance_parcourue": record.distance_parcourue,
+            "date_creation": record.date_creation.isoformat(),
+            "observations": record.observations,
+        }
+        if record.date_modification:
+            mission["date_modification"] = record.date_modification.isoformat()
+        return mission
@@ -0,0 +1,263 @@
+"""
+Recherche floue des véhicules
+PostgreSQL : index trigram (pg_trgm) ; SQLite / démo : index n-gram en mémoire
+
+Les immatriculations sont normalisées (majuscules, sans séparateurs) pour que
+"ABC123", "abc 123" et "ABC-123" désignent le même véhicule.
+"""
+
+import asyncio
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func, or_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import register_ddl
+from models.vehicule import Vehicule
+
+# Seuil minimal de pertinence (part des trigrammes de la recherche retrouvés)
+MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0.5"))
+
+# Reconstruction périodique de l'index mémoire (écritures d'autres workers)
+INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+
+def normalize(value: Optional[str]) -> str:
+    """Majuscules sans accents ni séparateurs : 'abc-123' -> 'ABC123'"""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub("", value.upper())
+
+def trigrams(value: str) -> set:
+    """Trigrammes avec bourrage, comme pg_trgm ('  A', ' AB', 'ABC', ...)"""
+    if not value:
+        return set()
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# --- PostgreSQL : pg_trgm -------------------------------------------------
+
+def _plate_expr():
+    """Expression SQL de l'immatriculation normalisée (identique à l'index)"""
+    return func.regexp_replace(func.upper(Vehicule.immatriculation), "[^A-Z0-9]", "", "g")
+
+register_ddl("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+register_ddl(
+    "CREATE INDEX IF NOT EXISTS ix_core_vehicule_plaque_trgm ON core_vehicule "
+    "USING gin ((regexp_replace(upper(immatriculation), '[^A-Z0-9]', '', 'g')) gin_trgm_ops)"
+)
+register_ddl(
+    "CREATE INDEX IF NOT EXISTS ix_core_vehicule_marque_trgm ON core_vehicule "
+    "USING gin (marque gin_trgm_ops)"
+)
+register_ddl(
+    "CREATE INDEX IF NOT EXISTS ix_core_vehicule_modele_trgm ON core_vehicule "
+    "USING gin (modele gin_trgm_ops)"
+)
+
+def _pg_condition(term: str):
+    """Prédicat servi par les index GIN trigram"""
+    plaque = normalize(term)
+    conditions = [
+        Vehicule.marque.op("%>")(term),  # word_similarity(term, marque) > seuil
+        Vehicule.modele.op("%>")(term),
+    ]
+    if plaque:
+        conditions.append(_plate_expr().op("%")(plaque))
+        conditions.append(_plate_expr().like(f"%{plaque}%"))
+    return or_(*conditions)
+
+def _pg_score(term: str):
+    """Pertinence : meilleure similarité parmi les trois champs"""
+    plaque = normalize(term)
+    return func.greatest(
+        func.similarity(_plate_expr(), plaque) if plaque else literal(0.0),
+        func.word_similarity(term, Vehicule.marque),
+        func.word_similarity(term, Vehicule.modele),
+    )
+
+# --- SQLite / démo : index inversé en mémoire ------------------------------
+
+class VehiculeSearchIndex:
+    """
+    Index inversé trigramme -> ids de véhicules
+    Construit à la première recherche, maintenu par les routes d'écriture
+    """
+
+    def __init__(self, ttl: float = INDEX_TTL):
+        self.ttl = ttl
+        self._postings: Dict[str, set] = {}
+        self._documents: Dict[int, Tuple[set, ...]] = {}
+        self._plates: Dict[int, str] = {}  # Clé de tri des pages keyset
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._build_lock = asyncio.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Construire l'index depuis la base si absent ou périmé"""
+        if self.is_fresh:
+            return
+        async with self._build_lock:
+            if self.is_fresh:
+                return
+            result = await db.execute(
+                select(Vehicule.id, Vehicule.immatriculation, Vehicule.marque, Vehicule.modele)
+            )
+            postings: Dict[str, set] = {}
+            documents: Dict[int, Tuple[set, ...]] = {}
+            plates: Dict[int, str] = {}
+            for row in result:
+                documents[row.id] = self._index_document(postings, row.id, row[1:])
+                plates[row.id] = row.immatriculation
+            with self._lock:
+                self._postings, self._documents, self._plates = postings, documents, plates
+                self._built_at = time.monotonic()
+
+    @staticmethod
+    def _index_document(postings: Dict[str, set], vehicule_id: int, fields) -> Tuple[set, ...]:
+        grams = tuple(trigrams(normalize(value)) for value in fields)
+        for gram in set().union(*grams):
+            postings.setdefault(gram, set()).add(vehicule_id)
+        return grams
+
+    def upsert(self, vehicule: Vehicule) -> None:
+        """Indexer (ou réindexer) un véhicule après création / modification"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._remove_locked(vehicule.id)
+            self._documents[vehicule.id] = self._index_document(
+                self._postings,
+                vehicule.id,
+                (vehicule.immatriculation, vehicule.marque, vehicule.modele),
+            )
+            self._plates[vehicule.id] = vehicule.immatriculation
+
+    def remove(self, vehicule_id: int) -> None:
+        """Retirer un véhicule supprimé"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._remove_locked(vehicule_id)
+
+    def invalidate(self) -> None:
+        """Forcer une reconstruction à la prochaine recherche (imports massifs)"""
+        with self._lock:
+            self._built_at = None
+
+    def _remove_locked(self, vehicule_id: int) -> None:
+        self._plates.pop(vehicule_id, None)
+        grams = self._documents.pop(vehicule_id, None)
+        if grams is None:
+            return
+        for gram in set().union(*grams):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(vehicule_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term: str) -> List[Tuple[int, float]]:
+        """(id, score) triés par pertinence décroissante puis id"""
+        query = trigrams(normalize(term))
+        if not query:
+            return []
+        needed = MIN_SCORE * len(query)
+        with self._lock:
+            hits = Counter()
+            for gram in query:
+                hits.update(self._postings.get(gram, ()))
+            scored = []
+            for vehicule_id, count in hits.items():
+                if count < needed:
+                    continue
+                # Score par champ : couverture de la recherche, départagée par Jaccard
+                best = 0.0
+                for grams in self._documents[vehicule_id]:
+                    shared = len(query & grams)
+                    if shared:
+                        coverage = shared / len(query)
+                        jaccard = shared / (len(query) + len(grams) - shared)
+                        best = max(best, coverage * 0.8 + jaccard * 0.2)
+                if best >= MIN_SCORE * 0.8:
+                    scored.append((vehicule_id, best))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored
+
+    def keyset_ids(self, term: str, order_by: str, after: Optional[Sequence], limit: int) -> List[int]:
+        """
+        Ids trouvés pour la page keyset : clé de tri (id, ou immatriculation
+        puis id) strictement après `after`, les `limit` premiers
+        """
+        ids = [vehicule_id for vehicule_id, _ in self.search(term)]
+        with self._lock:
+            if order_by == "immatriculation":
+                plates = self._plates
+                key = lambda vehicule_id: (plates.get(vehicule_id) or "", vehicule_id)
+            else:
+                key = lambda vehicule_id: (vehicule_id,)
+        if after is not None:
+            after = tuple(after)
+            ids = [vehicule_id for vehicule_id in ids if key(vehicule_id) > after]
+        return heapq.nsmallest(limit, ids, key=key)
+
+vehicule_index = VehiculeSearchIndex()
+
+# --- API commune ----------------------------------------------------------
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+async def search_vehicules(
+    db: AsyncSession, term: str, skip: int = 0, limit: int = 10, columns: Optional[Sequence] = None
+) -> list:
+    """
+    Véhicules correspondant à `term`, classés par pertinence
+    `columns` : lignes limitées à ces colonnes (projection ?fields=) plutôt que des objets ORM
+    """
+    query = select(*columns) if columns else select(Vehicule)
+    if _is_postgres(db):
+        result = await db.execute(
+            query
+            .where(_pg_condition(term))
+            .order_by(_pg_score(term).desc(), Vehicule.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.all() if columns else result.scalars().all()
+
+    await vehicule_index.ensure_loaded(db)
+    ids = [vehicule_id for vehicule_id, _ in vehicule_index.search(term)[skip:skip + limit]]
+    if not ids:
+        return []
+    # id lu en plus pour rétablir l'ordre de pertinence
+    result = await db.execute(query.add_columns(Vehicule.id.label("_search_id")).where(Vehicule.id.in_(ids)))
+    by_id = {row._search_id: row for row in result}
+    rows = [by_id[vehicule_id] for vehicule_id in ids if vehicule_id in by_id]
+    return rows if columns else [row[0] for row in rows]
+
+async def search_condition(
+    db: AsyncSession, term: str, order_by: str = "id", after: Optional[Sequence] = None, limit: int = 100
+):
+    """
+    Prédicat de recherche à combiner avec un autre tri (pagination keyset)
+    SQLite : liste IN bornée à la page demandée (`limit` ids après la clé `after`)
+    """
+    if _is_postgres(db):
+        return _pg_condition(term)
+
+    await vehicule_index.ensure_loaded(db)
+    return Vehicule.id.in_(vehicule_index.keyset_ids(term, order_by, after, limit))
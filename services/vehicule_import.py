@@ -0,0 +1,186 @@
+"""
+Import massif de véhicules (CSV / NDJSON)
+Lecture en flux, validation VehiculeCreate, écriture par lots
+(COPY sur PostgreSQL, executemany ailleurs)
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, or_, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from models.vehicule import Vehicule
+from schemas.vehicule import VehiculeCreate
+
+# Nombre de lignes validées puis écrites ensemble
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+
+# Au-delà, les erreurs sont seulement comptées (mémoire bornée)
+MAX_ERRORS_REPORTED = 1000
+
+COLUMNS = list(VehiculeCreate.__fields__) + [
+    "kilometrage_dernier_entretien", "date_creation", "date_modification"
+]
+
+class ImportReport:
+    """Rapport d'import ligne par ligne"""
+
+    def __init__(self):
+        self.lignes = 0
+        self.importes = 0
+        self.nb_erreurs = 0
+        self.erreurs: List[dict] = []
+
+    def error(self, ligne: int, messages: List[str], immatriculation: Optional[str] = None) -> None:
+        self.nb_erreurs += 1
+        if len(self.erreurs) < MAX_ERRORS_REPORTED:
+            self.erreurs.append({"ligne": ligne, "immatriculation": immatriculation, "erreurs": messages})
+
+    def as_dict(self) -> dict:
+        return {
+            "lignes": self.lignes,
+            "importes": self.importes,
+            "rejetes": self.nb_erreurs,
+            "erreurs": self.erreurs,
+            "erreurs_tronquees": self.nb_erreurs > len(self.erreurs)
+        }
+
+def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """(numéro de ligne, dict brut ou message d'erreur de parsing)"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Cellules vides -> None pour les champs optionnels
+            yield reader.line_num, {k: (v if v != "" else None) for k, v in row.items() if k}
+        return
+
+    for numero, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield numero, f"JSON invalide: {e}"
+            continue
+        yield numero, data if isinstance(data, dict) else "Objet JSON attendu"
+
+def _validate_batch(rows: Iterator[Tuple[int, object]], size: int, report: ImportReport) -> List[Tuple[int, dict]]:
+    """Lire et valider jusqu'à `size` lignes (exécuté hors boucle d'événements)"""
+    batch = []
+    now = datetime.now(timezone.utc)
+    for numero, raw in rows:
+        report.lignes += 1
+        if isinstance(raw, str):
+            report.error(numero, [raw])
+        else:
+            try:
+                vehicule = VehiculeCreate(**raw)
+            except ValidationError as e:
+                messages = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+                report.error(numero, messages, raw.get("immatriculation"))
+            else:
+                data = vehicule.dict()
+                data.update(kilometrage_dernier_entretien=0, date_creation=now, date_modification=now)
+                batch.append((numero, data))
+        if len(batch) >= size:
+            break
+    return batch
+
+async def _existing_keys(db: AsyncSession, batch: List[Tuple[int, dict]]) -> Tuple[set, set]:
+    """Immatriculations et châssis du lot déjà présents en base (une requête)"""
+    plaques = [data["immatriculation"] for _, data in batch]
+    chassis = [data["numero_chassis"] for _, data in batch]
+    result = await db.execute(
+        select(Vehicule.immatriculation, Vehicule.numero_chassis)
+        .where(or_(Vehicule.immatriculation.in_(plaques), Vehicule.numero_chassis.in_(chassis)))
+    )
+    rows = result.all()
+    return {row.immatriculation for row in rows}, {row.numero_chassis for row in rows}
+
+def _unique_rows(batch, plaques_existantes: set, chassis_existants: set, report: ImportReport) -> List[Tuple[int, dict]]:
+    """Écarter les doublons (base et intra-lot) avec une erreur par ligne"""
+    retenus = []
+    for numero, data in batch:
+        messages = []
+        if data["immatriculation"] in plaques_existantes:
+            messages.append("Un véhicule avec cette immatriculation existe déjà")
+        if data["numero_chassis"] in chassis_existants:
+            messages.append("Un véhicule avec ce numéro de châssis existe déjà")
+        if messages:
+            report.error(numero, messages, data["immatriculation"])
+            continue
+        plaques_existantes.add(data["immatriculation"])
+        chassis_existants.add(data["numero_chassis"])
+        retenus.append((numero, data))
+    return retenus
+
+# SQLSTATE d'une violation d'unicité (PostgreSQL)
+UNIQUE_VIOLATION = "23505"
+
+async def _copy_rows(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    COPY binaire via asyncpg, sur la connexion de la transaction en cours
+    Appel direct au driver : ses erreurs ne passent pas par SQLAlchemy, une
+    violation d'unicité (asyncpg.UniqueViolationError) est convertie en
+    IntegrityError pour déclencher le repli ligne par ligne
+    """
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    records = [tuple(row[column] for column in COLUMNS) for row in rows]
+    try:
+        await raw.connection.driver_connection.copy_records_to_table(
+            Vehicule.__tablename__, records=records, columns=COLUMNS
+        )
+    except Exception as e:
+        if getattr(e, "sqlstate", None) == UNIQUE_VIOLATION:
+            raise IntegrityError(f"COPY {Vehicule.__tablename__}", None, e) from e
+        raise
+
+async def _write_batch(db: AsyncSession, batch: List[Tuple[int, dict]], report: ImportReport) -> None:
+    """Écrire un lot ; en cas de conflit concurrent, repli ligne par ligne"""
+    rows = [data for _, data in batch]
+    try:
+        if db.bind.dialect.name == "postgresql":
+            await _copy_rows(db, rows)
+        else:
+            await db.execute(insert(Vehicule.__table__), rows)
+        await db.commit()
+        report.importes += len(rows)
+        return
+    except IntegrityError:
+        await db.rollback()
+
+    for numero, data in batch:
+        try:
+            await db.execute(insert(Vehicule.__table__), [data])
+            await db.commit()
+            report.importes += 1
+        except IntegrityError as e:
+            await db.rollback()
+            report.error(numero, [f"Contrainte d'unicité: {e.orig}"], data["immatriculation"])
+
+async def import_vehicules(db: AsyncSession, stream: BinaryIO, fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Importer un fichier de véhicules lot par lot
+    Un lot invalide n'interrompt pas l'import : chaque rejet est rapporté
+    """
+    report = ImportReport()
+    rows = iter_rows(stream, fmt)
+    while True:
+        batch = await run_in_threadpool(_validate_batch, rows, batch_size, report)
+        if not batch:
+            break
+        plaques, chassis = await _existing_keys(db, batch)
+        batch = _unique_rows(batch, plaques, chassis, report)
+        if batch:
+            await _write_batch(db, batch, report)
+    return report.as_dict()
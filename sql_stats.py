@@ -0,0 +1,187 @@
+"""
+Instrumentation SQL par requête HTTP
+Événements du moteur SQLAlchemy : nombre de requêtes et temps passé en base
+par requête (en-tête Server-Timing et métriques), journal des requêtes lentes
+(SQL normalisé) et détection des N+1 (même forme répétée dans une requête).
+
+Mode strict (SQL_STRICT=1 ou sql_stats.STRICT = True dans les tests) :
+un N+1 ou un dépassement de QUERY_BUDGETS lève QueryBudgetExceeded.
+"""
+
+import logging
+import os
+import re
+from contextvars import ContextVar
+from functools import lru_cache
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from metrics import Counter, Histogram, UNMATCHED
+
+logger = logging.getLogger("ipsco.sql")
+
+# Seuil du journal des requêtes lentes (ms)
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+
+# Répétitions d'une même forme de requête signalées comme N+1 probable
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+# Mode strict : les anomalies lèvent une exception au lieu d'être journalisées
+STRICT = os.getenv("SQL_STRICT", "").lower() in ("1", "true", "yes")
+
+# Nombre maximal de requêtes SQL par route ("MÉTHODE modèle"), vérifié en mode strict
+QUERY_BUDGETS: Dict[str, int] = {
+    "GET /api/vehicules/": 3,
+    "GET /api/vehicules/{vehicule_id}": 2,
+    "GET /api/vehicules/batch": 1,
+    "POST /api/vehicules/": 5,
+    # Comptage, page, puis une requête par table liée (véhicules, utilisateurs)
+    "GET /api/missions/": 4,
+    "GET /api/missions/{mission_id}": 4,
+    "GET /api/missions/stats/dashboard": 2,
+}
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+db_queries = Counter(
+    "db_queries_total", "Requêtes SQL exécutées", ("method", "route")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Durée des requêtes SQL"
+)
+db_queries_per_request = Histogram(
+    "http_request_db_queries", "Requêtes SQL par requête HTTP", ("method", "route"), buckets=QUERY_BUCKETS
+)
+db_n_plus_one = Counter(
+    "db_n_plus_one_total", "N+1 probables détectés", ("method", "route")
+)
+
+class QueryBudgetExceeded(AssertionError):
+    """Mode strict : N+1 ou budget de requêtes dépassé"""
+
+class RequestStats:
+    """Requêtes SQL d'une requête HTTP"""
+    __slots__ = ("count", "duration", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement] = self.shapes.get(statement, 0) + 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[str]:
+        """Formes exécutées au moins `threshold` fois"""
+        return [shape for shape, count in self.shapes.items() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} SQL"'
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_stats", default=None)
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                     # chaînes
+    (re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+\b|%s"), "?"),   # paramètres asyncpg / psycopg2 / nommés
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),                   # nombres
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),  # listes IN
+    (re.compile(r"\s+"), " "),
+]
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """Forme de la requête : littéraux et paramètres remplacés par ?"""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+def current() -> Optional[RequestStats]:
+    """Statistiques de la requête HTTP en cours (None hors requête)"""
+    return _current.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_stats_start", []).append(perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = perf_counter() - conn.info["sql_stats_start"].pop()
+    db_query_duration.observe(duration)
+    shape = normalize_sql(statement)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(shape, duration)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Requête lente (%.0f ms) : %s", duration * 1000, shape)
+
+def instrument_engine(engine) -> None:
+    """Brancher les compteurs sur un moteur synchrone (ou async_engine.sync_engine)"""
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _check(labels: tuple, stats: RequestStats) -> None:
+    """N+1 et budget de la route : journal, ou exception en mode strict"""
+    route = " ".join(labels)
+    anomalies = [
+        f"N+1 probable ({stats.shapes[shape]}x) : {shape}" for shape in stats.repeated()
+    ]
+    if anomalies:
+        db_n_plus_one.inc(labels)
+    budget = QUERY_BUDGETS.get(route)
+    if STRICT and budget is not None and stats.count > budget:
+        anomalies.append(f"{stats.count} requêtes SQL pour un budget de {budget}")
+    if not anomalies:
+        return
+    if STRICT:
+        raise QueryBudgetExceeded(f"{route} : " + " ; ".join(anomalies))
+    for anomalie in anomalies:
+        logger.warning("%s : %s", route, anomalie)
+
+def _streamed(message) -> bool:
+    """
+    Réponse diffusée (StreamingResponse : ni Content-Length ni statut sans corps) :
+    ses requêtes s'exécutent après l'envoi des en-têtes, Server-Timing serait faux.
+    Elles restent comptées (le corps est diffusé dans ce même contexte) : métriques,
+    N+1 et budgets s'appliquent en fin de requête.
+    """
+    if message["status"] in (204, 304):
+        return False
+    return not any(name.lower() == b"content-length" for name, _ in message.get("headers", []))
+
+class SqlStatsMiddleware:
+    """
+    Middleware ASGI : compteur SQL propre à chaque requête (contextvar),
+    en-tête Server-Timing sur la réponse (sauf réponses diffusées), métriques
+    et contrôles en fin de requête
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+
+        async def send_timing(message):
+            if message["type"] == "http.response.start" and not _streamed(message):
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else UNMATCHED)
+            if stats.count:
+                db_queries.inc(labels, stats.count)
+                db_queries_per_request.observe(stats.count, labels)
+        _check(labels, stats)
@@ -0,0 +1,226 @@
+"""
+Démarrage de l'application (lifespan)
+Préchauffage en tâche de fond : import de database, création des tables
+propres à FastAPI (agrégats des missions), ouverture anticipée de
+connexions du pool (TLS vers Supabase), chargement des routeurs en mode
+lazy et configuration des mappers. Le port s'ouvre tout de suite ;
+/health/ready passe à 200 une fois le préchauffage terminé et les requêtes
+API arrivées avant attendent sa fin au lieu d'échouer.
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+from metrics import Gauge
+
+# Instant de référence : import de main (l'interpréteur est déjà chargé)
+STARTED_AT = time.time()
+
+# eager : routeurs importés avec main (tests, clients ASGI sans lifespan)
+# lazy : routeurs importés pendant le préchauffage, après l'ouverture du port
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+
+# Connexions ouvertes d'avance dans le pool asyncio
+POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", "2"))
+
+# Attente maximale d'une requête arrivée pendant le préchauffage (secondes)
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "30"))
+
+# Délai maximal entre deux tentatives de préchauffage après un échec (secondes)
+STARTUP_RETRY_MAX = float(os.getenv("STARTUP_RETRY_MAX", "30"))
+
+# Chemins servis même pendant le préchauffage
+ALWAYS_OPEN = ("/health", "/metrics")
+
+app_startup = Gauge(
+    "app_startup_seconds", "Durée des étapes du démarrage", ("phase",)
+)
+
+class StartupState:
+    """Avancement du démarrage, exposé par /health"""
+
+    def __init__(self):
+        self.warming = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.first_success: Optional[float] = None
+        self.attempts = 0
+        self._done = asyncio.Event()
+        self._done.set()  # Sans lifespan (tests) : rien à attendre
+
+    def begin(self) -> None:
+        self.warming = True
+        self._done.clear()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.error = error
+        self.warming = False
+        self.phase("ready", STARTED_AT, clock=time.time)
+        self._done.set()
+
+    def phase(self, name: str, start: float, clock: Callable[[], float] = perf_counter) -> None:
+        self.phases[name] = round(clock() - start, 4)
+        app_startup.set(self.phases[name], (name,))
+
+    def served(self) -> None:
+        """Première réponse API réussie : temps depuis le démarrage"""
+        self.first_success = round(time.time() - STARTED_AT, 4)
+        app_startup.set(self.first_success, ("first_success",))
+
+    @property
+    def ready(self) -> bool:
+        return not self.warming and self.error is None
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.error is None
+
+    def report(self) -> dict:
+        return {
+            "mode": STARTUP_MODE,
+            "ready": self.ready,
+            "error": self.error,
+            "attempts": self.attempts,
+            "phases_s": self.phases,
+            "first_success_s": self.first_success,
+        }
+
+state = StartupState()
+
+async def warm_pool(async_engine, count: int) -> int:
+    """Ouvrir `count` connexions simultanément et les rendre au pool"""
+    from sqlalchemy import text
+
+    pool = async_engine.sync_engine.pool
+    if count <= 0 or not hasattr(pool, "size"):
+        return 0  # NullPool / StaticPool : aucune connexion conservée
+    count = min(count, pool.size())
+
+    async def ouvrir():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ouvrir() for _ in range(count)))
+    return count
+
+async def _warm_up_once(load_routes: Callable[[], None], done: set) -> bool:
+    """Une tentative ; les étapes réussies (`done`) ne sont pas rejouées"""
+    from sqlalchemy.orm import configure_mappers
+
+    state.attempts += 1
+    try:
+        start = perf_counter()
+        database = await asyncio.to_thread(importlib.import_module, "database")
+        state.phase("database", start)
+
+        # Tables propres à FastAPI (agrégats des missions) : écritures et dashboard en dépendent
+        if "tables" not in done:
+            start = perf_counter()
+            await asyncio.to_thread(database.ensure_owned_tables)
+            state.phase("tables", start)
+            done.add("tables")
+
+        async def prechauffer_pool():
+            start = perf_counter()
+            engines = [database.async_engine]
+            if database.replica_engine is not None:
+                engines.append(database.replica_engine)
+            await asyncio.gather(*(warm_pool(engine, POOL_WARMUP) for engine in engines))
+            state.phase("pool", start)
+
+        # Poignées de main TLS pendant l'import des routeurs
+        pool = asyncio.create_task(prechauffer_pool())
+
+        if STARTUP_MODE == "lazy" and "routers" not in done:
+            start = perf_counter()
+            await asyncio.to_thread(load_routes)
+            state.phase("routers", start)
+            done.add("routers")  # Routeurs montés une seule fois
+
+        start = perf_counter()
+        await asyncio.to_thread(configure_mappers)
+        state.phase("mappers", start)
+
+        await pool
+    except Exception as e:
+        print(f"⚠️ Préchauffage incomplet (tentative {state.attempts}): {e!r}")
+        state.finish(error=e.__class__.__name__)
+        return False
+    state.finish()
+    return True
+
+async def warm_up(load_routes: Callable[[], None]) -> None:
+    """
+    Préchauffage ; les imports tournent dans un thread, la boucle continue de répondre.
+    En cas d'échec (base injoignable au démarrage), nouvelle tentative avec un
+    délai doublé à chaque fois (plafonné à STARTUP_RETRY_MAX) : /health/ready
+    repasse à 200 dès que la base répond, sans redémarrer le processus.
+    """
+    done: set = set()
+    delai = 1.0
+    while not await _warm_up_once(load_routes, done):
+        await asyncio.sleep(delai)
+        delai = min(delai * 2, STARTUP_RETRY_MAX)
+
+def lifespan(load_routes: Callable[[], None]):
+    """Contexte lifespan : préchauffage en tâche de fond, fermeture des pools à l'arrêt"""
+
+    @asynccontextmanager
+    async def context(app):
+        state.begin()
+        task = asyncio.create_task(warm_up(load_routes))
+        try:
+            yield
+        finally:
+            task.cancel()
+            database = sys.modules.get("database")
+            if database is not None:
+                await database.async_engine.dispose()
+                if database.replica_engine is not None:
+                    await database.replica_engine.dispose()
+                database.engine.dispose()
+
+    return context
+
+class ReadinessGate:
+    """
+    Middleware ASGI : pendant le préchauffage, les requêtes API attendent sa
+    fin (503 après STARTUP_TIMEOUT) ; enregistre la première réponse réussie
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(ALWAYS_OPEN):
+            await self.app(scope, receive, send)
+            return
+
+        if state.warming and not await state.wait(STARTUP_TIMEOUT):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"retry-after", b"5"), (b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Service en cours de d\\u00e9marrage"}'})
+            return
+
+        if state.first_success is not None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_first(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and state.first_success is None:
+                state.served()
+            await send(message)
+
+        await self.app(scope, receive, send_first)